@@ -0,0 +1,294 @@
+import argparse
+import csv
+import os
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # Optional, only this module needs it
+    np = None
+
+import binlog
+import instrumentation
+from replay import ReplayEngine
+from report import find_daily_logs
+from timecodec import format_date, format_duration, parse_date, parse_duration, parse_timestamp
+
+# Time breakdowns over many logs, computed on NumPy columns instead of row by row:
+#   day       seconds per entry per entry date
+#   week      seconds per entry per ISO week (Monday of the week)
+#   top       entries with the most seconds
+#   sessions  lengths of the Start -> Stop sessions, as a histogram and percentiles
+# Logs with an up-to-date binary sidecar are read straight from it with np.frombuffer.
+# CSV rows whose fields do not parse are still folded, as the replay does: an entry whose last row has
+# an invalid elapsed time or date has no total, and a row with an invalid timestamp starts or ends no session.
+SESSION_BINS = (0, 5 * 60, 15 * 60, 30 * 60, 3600, 2 * 3600, 4 * 3600)  # Lower bounds in seconds
+INVALID_TIMESTAMP = INVALID_ELAPSED = -2 ** 63
+INVALID_DATE = -2 ** 31
+
+if np is not None:
+    RECORD_DTYPE = np.dtype([("timestamp", "<i8"), ("elapsed", "<i4"), ("entry_date", "<i4"),
+                             ("name", "<i4"), ("comment", "<i4"), ("action", "u1"), ("padding", "V3")])
+    assert RECORD_DTYPE.itemsize == binlog.RECORD.size
+
+
+def require_numpy():
+    if np is None:
+        raise ImportError("The analytics module needs NumPy, install it with: pip install numpy")
+
+
+class Columns:
+    # Rows of one or more logs as parallel arrays. Names, comments and actions are codes into
+    # `strings` and `actions`, shared by all the logs; `log` is the index of the row's log.
+    def __init__(self):
+        require_numpy()
+        self.strings, self.string_ids = [], {}
+        self.actions, self.action_ids = [], {}
+        self.parts = []  # Per-log dicts of arrays, concatenated by finish()
+        self.paths = []
+
+    def intern(self, value):
+        string_id = self.string_ids.get(value)
+        if string_id is None:
+            string_id = self.string_ids[value] = len(self.strings)
+            self.strings.append(value)
+        return string_id
+
+    def action_code(self, action):
+        code = self.action_ids.get(action)
+        if code is None:
+            code = self.action_ids[action] = len(self.actions)
+            self.actions.append(action)
+        return code
+
+    def add_binlog(self, path):
+        with binlog.BinaryLogReader(path) as reader:
+            buffer = reader.buffer()
+            records = np.frombuffer(buffer, dtype=RECORD_DTYPE)
+            # Map the log's own string and action ids to the shared ones, one lookup per distinct value
+            string_map = np.array([self.intern(value) for value in reader.strings.strings] or [0], dtype=np.int32)
+            action_map = np.array([self.action_code(value) for value in reader.strings.actions], dtype=np.uint8)
+            part = {  # Copies, the map is closed below
+                "timestamp": records["timestamp"].copy(),
+                "elapsed": records["elapsed"].astype(np.int64),
+                "entry_date": records["entry_date"].copy(),
+                "name": string_map[records["name"]],
+                "comment": string_map[records["comment"]],
+                "action": action_map[records["action"]],
+            }
+            del records
+            buffer.release()
+        self._add_part(part)
+
+    def add_csv(self, path):
+        timestamps, elapsed, entry_dates = array("q"), array("q"), array("i")
+        names, comments, actions = array("i"), array("i"), array("B")
+        for row in ReplayEngine(path).read_new_rows():
+            if len(row) != 6:
+                continue
+            try:
+                timestamp = parse_timestamp(row[0])
+            except ValueError:
+                timestamp = INVALID_TIMESTAMP
+            try:
+                seconds = parse_duration(row[3])
+                entry_date = parse_date(row[4])
+            except ValueError:
+                seconds, entry_date = INVALID_ELAPSED, INVALID_DATE
+            timestamps.append(timestamp)
+            elapsed.append(seconds)
+            entry_dates.append(entry_date)
+            names.append(self.intern(row[2]))
+            comments.append(self.intern(row[5]))
+            actions.append(self.action_code(row[1]))
+        self._add_part({
+            "timestamp": np.frombuffer(timestamps, dtype=np.int64),
+            "elapsed": np.frombuffer(elapsed, dtype=np.int64),
+            "entry_date": np.frombuffer(entry_dates, dtype=np.int32),
+            "name": np.frombuffer(names, dtype=np.int32),
+            "comment": np.frombuffer(comments, dtype=np.int32),
+            "action": np.frombuffer(actions, dtype=np.uint8),
+        })
+
+    def add_log(self, path):
+        if binlog.is_up_to_date(path):
+            self.add_binlog(binlog.sidecar_path(path))
+        else:
+            self.add_csv(path)
+        self.paths.append(path)
+
+    def _add_part(self, part):
+        part["log"] = np.full(len(part["timestamp"]), len(self.parts), dtype=np.int32)
+        self.parts.append(part)
+
+    def finish(self):
+        for key in ("timestamp", "elapsed", "entry_date", "name", "comment", "action", "log"):
+            values = [part[key] for part in self.parts]
+            setattr(self, key, np.concatenate(values) if values else np.zeros(0, dtype=np.int64))
+        self.parts = []
+        return self
+
+    def code_of(self, action):
+        # Code of an action, or -1 when no row has it
+        return self.action_ids.get(action, -1)
+
+
+@instrumentation.timed("analytics.load")
+def load_columns(paths):
+    columns = Columns()
+    for path in paths:
+        columns.add_log(path)
+    return columns.finish()
+
+
+def load_folder(folder, start_date=None, end_date=None):
+    return load_columns([path for _, path in find_daily_logs(folder, start_date, end_date)])
+
+
+def final_states(columns):
+    # Same folding as ReplayEngine.apply, per log: the last row of every (log, name), minus removed
+    # entries and the previous names of renamed ones.
+    # Returns (name, entry_date, seconds) arrays, one element per live entry of each log.
+    count = len(columns.timestamp)
+    if not count:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+    order = np.lexsort((np.arange(count), columns.name, columns.log))
+    log, name = columns.log[order], columns.name[order]
+    last = np.ones(count, dtype=bool)
+    last[:-1] = (log[1:] != log[:-1]) | (name[1:] != name[:-1])
+    rows = order[last]  # Row index of the last row of each entry
+
+    live = columns.action[rows] != columns.code_of("Remove")
+    rename = columns.code_of("Rename")
+    if rename >= 0:
+        # Renames are rare, a dict over them is enough
+        last_row_of = {(int(columns.log[row]), int(columns.name[row])): position for position, row in enumerate(rows)}
+        prefix = "Renamed from "
+        for row in np.flatnonzero(columns.action == rename):
+            comment = columns.strings[columns.comment[row]]
+            old_name = columns.string_ids.get(comment[len(prefix):] if comment.startswith(prefix) else "")
+            position = last_row_of.get((int(columns.log[row]), old_name))
+            if position is not None and rows[position] < row:
+                live[position] = False
+    empty_name = columns.string_ids.get("")
+    if empty_name is not None:
+        live &= columns.name[rows] != empty_name
+    live &= columns.elapsed[rows] != INVALID_ELAPSED
+    rows = rows[live]
+    return columns.name[rows], columns.entry_date[rows], columns.elapsed[rows]
+
+
+def group_sum(keys, seconds):
+    # Sum of seconds per distinct row of `keys` (a 2D array), sorted by key
+    if not len(seconds):
+        return keys[:0], seconds[:0]
+    unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+    return unique_keys, np.bincount(inverse.ravel(), weights=seconds, minlength=len(unique_keys)).astype(np.int64)
+
+
+def by_day(columns):
+    name, entry_date, seconds = final_states(columns)
+    keys, totals = group_sum(np.column_stack((entry_date, name)), seconds)
+    return [(columns.strings[name_id], format_date(int(day)), int(total))
+            for (day, name_id), total in zip(keys, totals)]
+
+
+def by_week(columns):
+    name, entry_date, seconds = final_states(columns)
+    monday = entry_date - (entry_date + 3) % 7  # 1970-01-01 was a Thursday
+    keys, totals = group_sum(np.column_stack((monday, name)), seconds)
+    return [(columns.strings[name_id], format_date(int(day)), int(total))
+            for (day, name_id), total in zip(keys, totals)]
+
+
+def top_entries(columns, count=10):
+    name, _, seconds = final_states(columns)
+    if not len(seconds):
+        return []
+    totals = np.bincount(name, weights=seconds).astype(np.int64)
+    top = np.argsort(-totals, kind="stable")[:count]
+    return [(columns.strings[name_id], int(totals[name_id])) for name_id in top if totals[name_id] > 0]
+
+
+def session_lengths(columns):
+    # Wall-clock seconds between every Start and the Stop that follows it for the same entry and log
+    start, stop = columns.code_of("Start"), columns.code_of("Stop")
+    rows = np.flatnonzero((columns.action == start) | (columns.action == stop))
+    if len(rows) < 2:
+        return np.zeros(0, dtype=np.int64)
+    rows = rows[np.lexsort((rows, columns.name[rows], columns.log[rows]))]
+    action, name, log = columns.action[rows], columns.name[rows], columns.log[rows]
+    valid = columns.timestamp[rows] != INVALID_TIMESTAMP
+    pairs = (action[:-1] == start) & (action[1:] == stop) & (name[:-1] == name[1:]) & (log[:-1] == log[1:]) \
+        & valid[:-1] & valid[1:]
+    lengths = columns.timestamp[rows[1:][pairs]] - columns.timestamp[rows[:-1][pairs]]
+    return lengths[lengths >= 0]  # The clock may have been set back in between
+
+
+def session_distribution(columns, bins=SESSION_BINS):
+    lengths = session_lengths(columns)
+    counts = np.bincount(np.searchsorted(bins, lengths, side="right") - 1, minlength=len(bins)) if len(lengths) \
+        else np.zeros(len(bins), dtype=np.int64)
+    histogram = []
+    for i, lower in enumerate(bins):
+        upper = format_duration(bins[i + 1]) if i + 1 < len(bins) else ""
+        histogram.append((format_duration(lower), upper, int(counts[i])))
+    stats = {"sessions": int(len(lengths))}
+    if len(lengths):
+        stats.update(mean=float(lengths.mean()), median=float(np.median(lengths)),
+                     p90=float(np.percentile(lengths, 90)), longest=int(lengths.max()))
+    return histogram, stats
+
+
+BREAKDOWNS = {
+    "day": (["Name", "Entry Date", "Elapsed Time"], by_day),
+    "week": (["Name", "Week Of", "Elapsed Time"], by_week),
+    "top": (["Name", "Elapsed Time"], top_entries),
+}
+
+
+def breakdown_rows(columns, kind, top=10):
+    if kind == "sessions":
+        histogram, stats = session_distribution(columns)
+        rows = [[lower, upper, count] for lower, upper, count in histogram]
+        rows += [[key, "", format_duration(value) if key != "sessions" else value] for key, value in stats.items()]
+        return ["From", "To", "Sessions"], rows
+    headers, compute = BREAKDOWNS[kind]
+    results = compute(columns, top) if kind == "top" else compute(columns)
+    return headers, [list(result[:-1]) + [format_duration(result[-1])] for result in results]
+
+
+def export_csv(headers, rows, path):
+    with open(path, "w", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(headers)
+        writer.writerows(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time breakdowns over the daily logs of a folder.")
+    parser.add_argument("folder", nargs="?", default=os.getcwd())
+    parser.add_argument("--by", choices=("day", "week", "top", "sessions"), default="day")
+    parser.add_argument("--start", help="first date, YYYY-MM-DD")
+    parser.add_argument("--end", help="last date, YYYY-MM-DD")
+    parser.add_argument("--top", type=int, default=10, help="number of entries for --by top")
+    parser.add_argument("--output", help="write the breakdown as CSV instead of printing it")
+    args = parser.parse_args(argv)
+    try:
+        require_numpy()
+    except ImportError as e:
+        parser.exit(1, f"{e}\n")
+    columns = load_folder(args.folder, args.start, args.end)
+    headers, rows = breakdown_rows(columns, args.by, args.top)
+    if args.output:
+        export_csv(headers, rows, args.output)
+        print(f"{len(rows)} row(s) written to {args.output}")
+    else:
+        print("  ".join(headers))
+        for row in rows:
+            print("  ".join(str(value) for value in row))
+
+
+if __name__ == "__main__":
+    main()
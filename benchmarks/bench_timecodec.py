@@ -0,0 +1,116 @@
+import argparse
+import calendar
+import csv
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import generate_logs
+import timecodec
+
+# Microbenchmarks of the time codec against the strftime/strptime/split code it replaced, kept here
+# as the baseline. "decode_rows" parses the timestamp and elapsed time of every row of a log, as the
+# binary log conversion and the analytics do; "log_rows" formats them, as every logged row does.
+
+
+def baseline_parse_duration(text):
+    h, m, s = map(int, text.split(":"))
+    return h * 3600 + m * 60 + s
+
+
+def baseline_format_duration(seconds):
+    return time.strftime("%H:%M:%S", time.gmtime(seconds))
+
+
+def baseline_parse_timestamp(text):
+    return calendar.timegm((int(text[0:4]), int(text[5:7]), int(text[8:10]), int(text[11:13]), int(text[14:16]),
+                            int(text[17:19]), 0, 0, 0))
+
+
+def baseline_local_timestamp(now):
+    return datetime.fromtimestamp(now).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def clear_caches():
+    timecodec.parse_date.cache_clear()
+    timecodec.format_date.cache_clear()
+    timecodec._last_local = (None, "")
+
+
+def best_of(func, repeat):
+    best = None
+    for _ in range(repeat):
+        clear_caches()  # Every run starts cold, the speedups include filling the caches
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def cases(rows):
+    timestamps = [row[0] for row in rows]
+    durations = [row[3] for row in rows]
+    seconds = [timecodec.parse_duration(duration) for duration in durations]
+    now = time.time()
+    clocks = [now + i / 100 for i in range(len(rows))]  # A burst of rows, as a combine or a batch logs
+    ticks = [3600 + i for i in range(len(rows))]  # A running timer, one new second per tick
+    return [
+        ("parse_duration", lambda: [baseline_parse_duration(d) for d in durations],
+         lambda: [timecodec.parse_duration(d) for d in durations]),
+        ("parse_timestamp", lambda: [baseline_parse_timestamp(t) for t in timestamps],
+         lambda: [timecodec.parse_timestamp(t) for t in timestamps]),
+        ("format_duration", lambda: [baseline_format_duration(s) for s in seconds],
+         lambda: [timecodec.format_duration(s) for s in seconds]),
+        ("format_tick", lambda: [baseline_format_duration(s) for s in ticks],
+         lambda: [timecodec.format_duration(s) for s in ticks]),
+        ("local_timestamp", lambda: [baseline_local_timestamp(c) for c in clocks],
+         lambda: [timecodec.local_timestamp(c) for c in clocks]),
+        ("decode_rows", lambda: [(baseline_parse_timestamp(t), baseline_parse_duration(d))
+                                 for t, d in zip(timestamps, durations)],
+         lambda: [(timecodec.parse_timestamp(t), timecodec.parse_duration(d)) for t, d in zip(timestamps, durations)]),
+        ("log_rows", lambda: [(baseline_local_timestamp(c), baseline_format_duration(s))
+                              for c, s in zip(clocks, seconds)],
+         lambda: [(timecodec.local_timestamp(c), timecodec.format_duration(s)) for c, s in zip(clocks, seconds)]),
+    ]
+
+
+def bench(results, size, path, repeat=3):
+    # Adds "timecodec.<case>" and "timecodec.<case>.baseline" to run_benchmarks' Results
+    with open(path, newline="") as csv_file:
+        rows = [row for row in csv.reader(csv_file) if len(row) == 6][1:]
+    speedups = {}
+    for name, baseline, codec in cases(rows):
+        baseline_seconds = best_of(baseline, repeat)
+        codec_seconds = best_of(codec, repeat)
+        results.add(f"timecodec.{name}.baseline", size, baseline_seconds)
+        results.add(f"timecodec.{name}", size, codec_seconds)
+        speedups[name] = baseline_seconds / codec_seconds if codec_seconds else None
+    return speedups
+
+
+class PrintResults:
+    def add(self, name, size, seconds, operations=None):
+        print(f"{name:<32} {size:>9} {seconds * 1000:>12.2f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the time codec against the code it replaced.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000], help="log sizes in rows")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+    with tempfile.TemporaryDirectory() as work_dir:
+        for size in args.sizes:
+            path = generate_logs.write_log(os.path.join(work_dir, f"codec {size} - time tracking.csv"), size)
+            speedups = bench(PrintResults(), size, path, args.repeat)
+            print("  ".join(f"{name} x{speedup:.1f}" for name, speedup in speedups.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import argparse
+import csv
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from replay import CSV_HEADERS
+
+
+def generate_rows(rows, entries=50, renames=0.01, removes=0.01, entry_date="2026-01-01", seed=0):
+    # Synthetic action log with the actions the app writes: Start/Stop pairs, time changes,
+    # and a configurable share of renames and removes
+    rng = random.Random(seed)
+    names = [f"task {i}" for i in range(entries)]
+    elapsed = {name: 0 for name in names}
+    clock = time.mktime(time.strptime(entry_date, "%Y-%m-%d")) + 8 * 3600
+    renamed = 0
+    for _ in range(rows):
+        clock += rng.randint(1, 120)
+        timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(clock))
+        name = rng.choice(names)
+        roll = rng.random()
+        comment = ""
+        if roll < renames:
+            renamed += 1
+            new_name = f"{name} renamed {renamed}"
+            names[names.index(name)] = new_name
+            elapsed[new_name] = elapsed.pop(name)
+            action, comment, name = "Rename", f"Renamed from {name}", new_name
+        elif roll < renames + removes:
+            action = "Remove"
+            elapsed[name] = 0
+        else:
+            action = rng.choice(("Start", "Stop", "Stop", "Add Time", "Remove Time"))
+            if action == "Stop":
+                elapsed[name] += rng.randint(60, 3600)
+            elif action == "Add Time":
+                elapsed[name] += 900
+            elif action == "Remove Time":
+                elapsed[name] = max(0, elapsed[name] - 900)
+        yield [timestamp, action, name, time.strftime("%H:%M:%S", time.gmtime(elapsed[name] % 86400)),
+               entry_date, comment]
+
+
+def write_log(path, rows, entries=50, renames=0.01, removes=0.01, entry_date="2026-01-01", seed=0):
+    with open(path, "w", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(CSV_HEADERS)
+        writer.writerows(generate_rows(rows, entries, renames, removes, entry_date, seed))
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic time tracking log.")
+    parser.add_argument("output", help="path of the CSV to write")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--entries", type=int, default=50)
+    parser.add_argument("--renames", type=float, default=0.01, help="share of Rename rows")
+    parser.add_argument("--removes", type=float, default=0.01, help="share of Remove rows")
+    parser.add_argument("--date", default="2026-01-01", help="entry date of the rows")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    write_log(args.output, args.rows, args.entries, args.renames, args.removes, args.date, args.seed)
+    print(f"Wrote {args.rows} rows to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+import argparse
+import csv
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import bench_timecodec
+import generate_logs
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+TICKS = 100  # Ticks timed per size for the per-tick refresh cost
+xvfb_process = None  # Xvfb started by setup_tk, stopped by stop_xvfb
+
+
+def timed(func, *args, repeat=1):
+    # Best wall-clock time over `repeat` runs, and the last result
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+class Results:
+    def __init__(self):
+        self.results = []
+
+    def add(self, name, size, seconds, operations=None):
+        operations = operations or size
+        self.results.append({"name": name, "size": size, "seconds": seconds,
+                             "per_second": operations / seconds if seconds else None})
+        print(f"{name:<32} {size:>9} {seconds * 1000:>12.2f} ms")
+
+
+def null_log(action, entry, comment=""):
+    pass
+
+
+def bench_replay(results, size, work_dir):
+    from replay import ReplayEngine
+    path = generate_logs.write_log(os.path.join(work_dir, f"replay {size} - time tracking.csv"), size)
+    seconds, _ = timed(lambda: ReplayEngine(path).replay(use_checkpoint=False))
+    results.add("replay.full", size, seconds)
+
+    ReplayEngine(path).replay()  # Write the checkpoint
+    appended = max(1, size // 100)
+    with open(path, "a", newline="") as csv_file:
+        csv.writer(csv_file).writerows(generate_logs.generate_rows(appended, seed=1))
+    seconds, _ = timed(lambda: ReplayEngine(path).replay())
+    results.add("replay.from_checkpoint", size, seconds, appended)
+    return path
+
+
+def bench_binlog(results, size, path):
+    import binlog
+    seconds, bin_path = timed(binlog.csv_to_binary, path)
+    results.add("binlog.convert", size, seconds)
+
+    def fold():
+        with binlog.BinaryLogReader(bin_path) as reader:
+            return reader.last_entries()
+    seconds, _ = timed(fold)
+    results.add("binlog.fold", size, seconds)
+
+
+def bench_analytics(results, size, path):
+    import analytics
+    if analytics.np is None:
+        return  # NumPy is optional
+    seconds, columns = timed(analytics.load_columns, [path])
+    results.add("analytics.load", size, seconds)
+    seconds, _ = timed(analytics.by_day, columns)
+    results.add("analytics.by_day", size, seconds)
+    seconds, _ = timed(analytics.session_lengths, columns)
+    results.add("analytics.session_lengths", size, seconds)
+
+
+def bench_sqlite(results, size, path, work_dir):
+    import storage
+    db_path = os.path.join(work_dir, f"bench {size}.sqlite3")
+    folder = os.path.dirname(path)
+    seconds, _ = timed(storage.import_csv_folder, folder, db_path)
+    results.add("sqlite.import", size, seconds)
+    connection = storage.connect(db_path)
+    seconds, _ = timed(storage.load_entries, connection, os.path.basename(path))
+    results.add("sqlite.load", size, seconds, 1)
+    connection.close()
+
+
+def bench_log_writer(results, size, work_dir):
+    from log_writer import FLUSH_EVERY_INTERVAL, FLUSH_EVERY_ROWS, FSYNC_ON_STOP, LogWriter
+    rows = list(generate_logs.generate_rows(size))
+    for label, mode, value in (("log_writer.flush_every_row", FLUSH_EVERY_ROWS, 1),
+                               ("log_writer.interval", FLUSH_EVERY_INTERVAL, 1000),
+                               ("log_writer.fsync_on_stop", FSYNC_ON_STOP, None)):
+        if mode == FSYNC_ON_STOP and size > 10000:
+            continue  # One fsync per Stop row, too slow to be useful at this size
+        path = os.path.join(work_dir, f"writer {size}.csv")
+
+        def write():
+            with open(path, "w", newline="") as csv_file:
+                writer = LogWriter(csv_file, mode, value)
+                for row in rows:
+                    writer.writerow(row)
+                writer.flush()
+        seconds, _ = timed(write)
+        results.add(label, size, seconds)
+
+
+def bench_session(results, size):
+    from model import Session
+    session = Session(log=null_log)
+    seconds, _ = timed(lambda: [session.add_entry(f"task {i}", "00:10:00") for i in range(size)])
+    results.add("session.add_entry", size, seconds)
+
+    for entry in session.entries.values():
+        entry.selected = True
+    seconds, _ = timed(session.add_time_to_selected, 900)
+    results.add("session.add_time_to_selected", size, seconds)
+
+    seconds, _ = timed(session.total_time)
+    results.add("session.total_time", size, seconds, 1)
+
+    seconds, _ = timed(session.combine_selected_entries)
+    results.add("session.combine_selected", size, seconds)
+
+    for i in range(size):
+        session.add_entry(f"task {i}", "00:10:00")
+    ids = list(session.entries)
+    seconds, _ = timed(lambda: [session.remove_entry(entry_id) for entry_id in ids])
+    results.add("session.remove_entry", size, seconds)
+
+
+def stop_xvfb():
+    global xvfb_process
+    if xvfb_process is not None:
+        xvfb_process.terminate()
+        try:
+            xvfb_process.wait(5)
+        except subprocess.TimeoutExpired:
+            xvfb_process.kill()
+        xvfb_process = None
+
+
+def setup_tk(mode):
+    # Returns (tkinter module, description) or (None, reason); call stop_xvfb() when done
+    global xvfb_process
+    if mode == "none":
+        return None, "disabled"
+    if mode in ("auto", "real"):
+        try:
+            import tkinter
+            root = tkinter.Tk()
+            root.destroy()
+            return tkinter, "real"
+        except Exception as e:
+            xvfb = shutil.which("Xvfb")
+            if xvfb and not os.environ.get("DISPLAY"):
+                display = ":99"
+                xvfb_process = subprocess.Popen([xvfb, display, "-screen", "0", "1280x1024x24"],
+                                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                time.sleep(1)
+                os.environ["DISPLAY"] = display
+                try:
+                    root = tkinter.Tk()
+                    root.destroy()
+                    return tkinter, "xvfb"
+                except Exception:
+                    stop_xvfb()
+                    del os.environ["DISPLAY"]
+            if mode == "real":
+                return None, f"no display: {e}"
+    import tk_stub
+    return tk_stub.install(), "stub"
+
+
+def bench_app(results, size, tkinter, work_dir):
+    import time_tracking
+    folder = os.path.join(work_dir, f"app {size}")
+    os.makedirs(folder, exist_ok=True)
+    log_name = time.strftime("%Y-%m-%d") + " - time tracking.csv"
+    generate_logs.write_log(os.path.join(folder, log_name), size, entries=max(50, size // 20))
+
+    previous_dir = os.getcwd()
+    os.chdir(folder)  # The app works in the current directory
+    root = tkinter.Tk()
+    try:
+        def startup():
+            app = time_tracking.StopwatchApp(root)
+            app.loader.wait()  # The log is loaded on a worker thread
+            return app
+        seconds, app = timed(startup)
+        results.add("app.startup_and_load", size, seconds)
+        run_pending(tkinter, root)
+
+        entries = min(size, 10000)
+        seconds, _ = timed(lambda: [app.add_entry(f"new task {i}") for i in range(entries)])
+        results.add("app.add_entry", entries, seconds)
+        run_pending(tkinter, root)
+
+        seconds, _ = timed(app.update_total_time)
+        results.add("app.update_total_time", len(app.session.entries), seconds, 1)
+        seconds, _ = timed(app.update_window_size)
+        results.add("app.update_window_size", len(app.session.entries), seconds, 1)
+
+        entry = next(iter(app.session.entries.values()))
+        app.session.start(entry)
+        start = time.perf_counter()
+        for _ in range(TICKS):
+            app.tick()
+        results.add("app.tick", len(app.session.entries), (time.perf_counter() - start) / TICKS, 1)
+
+        for entry in list(app.session.entries.values())[:entries]:
+            entry.selected = True
+        seconds, _ = timed(app.combine_selected_entries)
+        results.add("app.combine_selected", entries, seconds)
+
+        ids = list(app.session.entries)[:entries]
+        seconds, _ = timed(lambda: [app.remove_entry(entry_id) for entry_id in ids])
+        results.add("app.remove_entry", entries, seconds)
+        app.storage.close()
+    finally:
+        root.destroy()
+        os.chdir(previous_dir)
+
+
+def run_pending(tkinter, root):
+    # Let the idle callbacks (row rendering) run
+    if hasattr(tkinter, "run_after"):
+        tkinter.run_after()
+    else:
+        root.update()
+
+
+def compare(results, baseline_path, threshold):
+    with open(baseline_path) as baseline_file:
+        baseline = {(r["name"], r["size"]): r["seconds"] for r in json.load(baseline_file)["results"]}
+    regressions = []
+    for result in results:
+        old = baseline.get((result["name"], result["size"]))
+        if old and result["seconds"] > old * threshold:
+            regressions.append(result)
+            print(f"REGRESSION {result['name']} size {result['size']}: "
+                  f"{old * 1000:.2f} ms -> {result['seconds'] * 1000:.2f} ms")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the load, replay, logging and UI refresh hot paths.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="log sizes in rows")
+    parser.add_argument("--tk", choices=("auto", "real", "stub", "none"), default="auto",
+                        help="how to run the Tk benchmarks, auto falls back to Xvfb then to the stub")
+    parser.add_argument("--max-app-size", type=int, default=100000, help="largest size for the Tk app benchmarks")
+    parser.add_argument("--output", default="bench_results.json", help="machine-readable results")
+    parser.add_argument("--compare", help="previous results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio reported as a regression")
+    args = parser.parse_args(argv)
+
+    tkinter, tk_mode = setup_tk(args.tk)
+    print(f"Tk benchmarks: {tk_mode}")
+    try:
+        results = Results()
+        with tempfile.TemporaryDirectory() as work_dir:
+            for size in args.sizes:
+                size_dir = os.path.join(work_dir, str(size))
+                os.makedirs(size_dir)
+                path = bench_replay(results, size, size_dir)
+                bench_timecodec.bench(results, size, path)
+                bench_binlog(results, size, path)
+                bench_analytics(results, size, path)
+                bench_sqlite(results, size, path, size_dir)
+                bench_log_writer(results, size, size_dir)
+                bench_session(results, size)
+                if tkinter and size <= args.max_app_size:
+                    bench_app(results, size, tkinter, size_dir)
+
+        report = {"python": platform.python_version(), "platform": platform.platform(), "tk": tk_mode,
+                  "created": time.strftime('%Y-%m-%d %H:%M:%S'), "results": results.results}
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+        print(f"Results written to {args.output}")
+
+        if args.compare and compare(results.results, args.compare, args.threshold):
+            sys.exit(1)
+    finally:
+        stop_xvfb()  # Also when a benchmark fails, or a later run would find :99 taken
+
+
+if __name__ == "__main__":
+    main()
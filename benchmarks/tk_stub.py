@@ -0,0 +1,176 @@
+import sys
+import types
+
+# Minimal stand-in for tkinter so that the app's Python-side costs can be measured on machines
+# without a display. Widgets only remember their options, after() callbacks are queued and run
+# by run_after().
+
+_pending = []
+
+
+class TclError(Exception):
+    pass
+
+
+class Variable:
+    _default = None
+
+    def __init__(self, master=None, value=None):
+        self._value = self._default if value is None else value
+        self._traces = []
+
+    def get(self):
+        return self._value
+
+    def set(self, value):
+        self._value = value
+        for callback in self._traces:
+            callback("", "", "w")
+
+    def trace(self, mode, callback):
+        self._traces.append(callback)
+
+
+class StringVar(Variable):
+    _default = ""
+
+
+class BooleanVar(Variable):
+    _default = False
+
+
+class Widget:
+    def __init__(self, master=None, **options):
+        self.master = master
+        self.options = dict(options)
+        self.variable = options.get("textvariable")
+        self.text = ""
+
+    def pack(self, **options):
+        pass
+
+    def bind(self, sequence, callback, add=None):
+        pass
+
+    def destroy(self):
+        pass
+
+    def config(self, **options):
+        self.options.update(options)
+
+    configure = config
+
+    def cget(self, option):
+        return self.options.get(option)
+
+    def __getitem__(self, option):
+        if option == "menu":
+            return self.options.setdefault("menu", Menu())
+        return self.options.get(option)
+
+    def after(self, ms, callback=None, *args):
+        _pending.append((ms, callback, args))
+        return f"after#{len(_pending)}"
+
+    def after_idle(self, callback, *args):
+        return self.after(0, callback, *args)
+
+    def after_cancel(self, job):
+        pass
+
+    def update_idletasks(self):
+        pass
+
+    def winfo_reqwidth(self):
+        return 600
+
+    def winfo_reqheight(self):
+        return 30
+
+    def winfo_width(self):
+        return 600
+
+    def winfo_height(self):
+        return 400
+
+    def geometry(self, spec=None):
+        pass
+
+    def title(self, text):
+        pass
+
+    def protocol(self, name, callback):
+        pass
+
+    def mainloop(self):
+        pass
+
+    # Entry
+    def get(self):
+        return self.variable.get() if self.variable else self.text
+
+    def insert(self, index, text):
+        if self.variable:
+            self.variable.set(self.variable.get() + text)
+        else:
+            self.text += text
+
+    def delete(self, first, last=None):
+        if self.variable:
+            self.variable.set("")
+        else:
+            self.text = ""
+
+    # Canvas
+    def create_window(self, position, **options):
+        return id(options.get("window"))
+
+    def coords(self, item, *position):
+        pass
+
+    def itemconfigure(self, item, **options):
+        pass
+
+    def yview(self, *args):
+        pass
+
+    def canvasy(self, y):
+        return y
+
+    def set(self, *args):
+        pass
+
+
+class Menu(Widget):
+    def add_command(self, label=None, command=None):
+        pass
+
+
+def OptionMenu(master, variable, *values, **options):
+    return Widget(master)
+
+
+def run_after(max_ms=0):
+    # Run the queued after() callbacks whose delay is at most max_ms, once
+    due = [job for job in _pending if job[0] <= max_ms]
+    _pending[:] = [job for job in _pending if job[0] > max_ms]
+    for _, callback, args in due:
+        callback(*args)
+
+
+def install():
+    module = types.ModuleType("tkinter")
+    module.TclError = TclError
+    module.StringVar, module.BooleanVar = StringVar, BooleanVar
+    module.Tk = module.Frame = module.Label = module.Button = module.Checkbutton = Widget
+    module.Entry = module.Canvas = module.Scrollbar = Widget
+    module.Menu, module.OptionMenu = Menu, OptionMenu
+    module.LEFT, module.RIGHT, module.END = "left", "right", "end"
+    module.NORMAL, module.DISABLED = "normal", "disabled"
+    module.run_after = run_after
+    filedialog = types.ModuleType("tkinter.filedialog")
+    filedialog.askdirectory = filedialog.askopenfilename = lambda **options: ""
+    module.filedialog = filedialog
+    sys.modules["tkinter"] = module
+    sys.modules["tkinter.filedialog"] = filedialog
+    return module
@@ -0,0 +1,337 @@
+import argparse
+import csv
+import mmap
+import os
+import struct
+from array import array
+
+import instrumentation
+from replay import CSV_HEADERS, ReplayEngine
+from timecodec import format_date, format_duration, format_timestamp, parse_date, parse_duration, parse_timestamp
+
+# Compact storage for the action log. The records file holds one fixed-width record per CSV row:
+#   timestamp  int64  seconds since 1970-01-01 of the wall-clock time written in the CSV
+#   elapsed    int32  seconds
+#   entry_date int32  days since 1970-01-01
+#   name       int32  id in the string table
+#   comment    int32  id in the string table
+#   action     uint8  ACTIONS index, extra actions found in the log are numbered after them
+# Names, comments and extra actions are interned in a string table file next to the records.
+# A row whose timestamp, elapsed time or entry date does not parse cannot be stored, but
+# ReplayEngine.apply still folds it: a sidecar that missed such a row never counts as up to date,
+# and readers go back to the CSV.
+RECORD = struct.Struct("<qiiiiB3x")
+HEADER = struct.Struct("<8sIIQ")  # magic, version, record size, size of the CSV the records mirror
+MAGIC = b"TTLOG\x00\x00\x00"
+VERSION = 1
+STRING_ENTRY = struct.Struct("<BH")  # kind, byte length
+STRING_KIND = 0
+ACTION_KIND = 1
+
+RECORDS_SUFFIX = ".tlog"
+STRINGS_SUFFIX = ".tstr"
+BINARY_LOG_ENV_VAR = "TIMETRACKING_BINARY_LOG"  # Set to 1 to keep a binary sidecar next to every CSV log
+
+ACTIONS = ("Start", "Stop", "Add Time", "Remove Time", "Remove", "Rename", "Combine", "Latest Status", "Total")
+REMOVE = ACTIONS.index("Remove")
+RENAME = ACTIONS.index("Rename")
+
+def sidecar_path(csv_path):
+    return csv_path + RECORDS_SUFFIX
+
+
+def binary_log_enabled():
+    return os.environ.get(BINARY_LOG_ENV_VAR, "") not in ("", "0")
+
+
+class StringTable:
+    # Interned strings and extra actions of a binary log, loaded fully in memory
+    def __init__(self, path):
+        self.path = path
+        self.strings = []
+        self.ids = {}
+        self.actions = list(ACTIONS)
+        self.action_codes = {action: code for code, action in enumerate(ACTIONS)}
+        self.file = None
+        if os.path.exists(path):
+            with open(path, "rb") as strings_file:
+                data = strings_file.read()
+            position = 0
+            while position + STRING_ENTRY.size <= len(data):
+                kind, length = STRING_ENTRY.unpack_from(data, position)
+                position += STRING_ENTRY.size
+                if position + length > len(data):
+                    break  # Truncated by a crash, the records referencing it were never written
+                value = data[position:position + length].decode("utf-8")
+                position += length
+                self._add(kind, value)
+
+    def _add(self, kind, value):
+        if kind == ACTION_KIND:
+            self.action_codes[value] = len(self.actions)
+            self.actions.append(value)
+            return self.action_codes[value]
+        self.ids[value] = len(self.strings)
+        self.strings.append(value)
+        return self.ids[value]
+
+    def _append(self, kind, value):
+        if self.file is None:
+            self.file = open(self.path, "ab")
+        encoded = value.encode("utf-8")
+        self.file.write(STRING_ENTRY.pack(kind, len(encoded)) + encoded)
+        return self._add(kind, value)
+
+    def string_id(self, value):
+        string_id = self.ids.get(value)
+        return string_id if string_id is not None else self._append(STRING_KIND, value)
+
+    def action_code(self, action):
+        code = self.action_codes.get(action)
+        return code if code is not None else self._append(ACTION_KIND, action)
+
+    def flush(self):
+        if self.file:
+            self.file.flush()
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+class BinaryLogWriter:
+    # Appends CSV-shaped rows to a binary log. Has the writerow/writerows interface of csv.writer
+    # so that it can mirror a LogWriter.
+    def __init__(self, path):
+        self.path = path
+        self.strings = StringTable(path + STRINGS_SUFFIX)
+        new_file = not os.path.exists(path) or os.path.getsize(path) < HEADER.size
+        self.file = open(path, "r+b" if not new_file else "w+b")
+        self.source_size = 0  # Size of the CSV file the records mirror, as recorded in the header
+        if new_file:
+            self.file.write(HEADER.pack(MAGIC, VERSION, RECORD.size, 0))
+        else:
+            header = self.file.read(HEADER.size)
+            check_header(header, path)
+            self.source_size = HEADER.unpack(header)[3]
+            # Drop a partial record left by a crash
+            size = self.file.seek(0, os.SEEK_END)
+            self.file.truncate(HEADER.size + (size - HEADER.size) // RECORD.size * RECORD.size)
+        self.file.seek(0, os.SEEK_END)
+        self.complete = True  # False once a row that the CSV replay folds could not be stored
+
+    def encode(self, row):
+        timestamp, action, name, elapsed_time, entry_date, comment = row
+        return RECORD.pack(parse_timestamp(timestamp), parse_duration(elapsed_time), parse_date(entry_date),
+                           self.strings.string_id(name), self.strings.string_id(comment),
+                           self.strings.action_code(action))
+
+    def writerow(self, row):
+        self.writerows([row])
+
+    def writerows(self, rows):
+        records = []
+        for row in rows:
+            try:
+                records.append(self.encode(row))
+            except (ValueError, IndexError):
+                print(f"Skipping row with invalid data formatting: {row}")
+                if len(row) == 6:
+                    self.complete = False  # Folded by the CSV replay, missing here
+        # Strings go out before the records that use them
+        self.strings.flush()
+        self.file.write(b"".join(records))
+
+    def set_source_size(self, size):
+        # Size of the CSV file these records mirror, to tell whether the sidecar is up to date.
+        # An incomplete sidecar records 0, which no CSV log (it has a header row) matches.
+        position = self.file.tell()
+        self.file.seek(HEADER.size - 8)
+        self.source_size = size if self.complete else 0
+        self.file.write(struct.pack("<Q", self.source_size))
+        self.file.seek(position)
+
+    def catch_up(self, csv_path, csv_size):
+        # Append the rows other writers added to the CSV after the size this sidecar last recorded.
+        # Returns False when the sidecar cannot be brought up to date that way and must be rebuilt:
+        # the file is shorter (replaced or truncated), no size was recorded, or a row could not be stored.
+        if not 0 < self.source_size < csv_size:
+            return False
+        engine = ReplayEngine(csv_path)
+        engine.offset = self.source_size
+        self.writerows(list(engine.read_new_rows()))
+        if engine.offset != csv_size:
+            return False
+        self.set_source_size(csv_size)
+        return self.complete
+
+    def flush(self):
+        self.strings.flush()
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.strings.close()
+        self.file.close()
+
+
+def check_header(data, path):
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path} is not a time tracking binary log")
+    magic, version, record_size, _ = HEADER.unpack(data[:HEADER.size])
+    if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+        raise ValueError(f"{path} is not a supported time tracking binary log")
+
+
+class BinaryLogReader:
+    # Memory-mapped read access to a binary log
+    def __init__(self, path):
+        self.path = path
+        self.strings = StringTable(path + STRINGS_SUFFIX)
+        with open(path, "rb") as records_file:
+            self.map = mmap.mmap(records_file.fileno(), 0, access=mmap.ACCESS_READ)
+        check_header(self.map, path)
+        self.source_size = HEADER.unpack_from(self.map)[3]
+        self.count = (len(self.map) - HEADER.size) // RECORD.size
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def buffer(self):
+        return memoryview(self.map)[HEADER.size:HEADER.size + self.count * RECORD.size]
+
+    def records(self):
+        # (timestamp, elapsed, entry_date, name_id, comment_id, action_code) tuples
+        return RECORD.iter_unpack(self.buffer())
+
+    def columns(self):
+        timestamps, elapsed, entry_dates = array("q"), array("i"), array("i")
+        names, comments, actions = array("i"), array("i"), array("B")
+        for record in self.records():
+            timestamps.append(record[0])
+            elapsed.append(record[1])
+            entry_dates.append(record[2])
+            names.append(record[3])
+            comments.append(record[4])
+            actions.append(record[5])
+        return {"timestamp": timestamps, "elapsed": elapsed, "entry_date": entry_dates,
+                "name": names, "comment": comments, "action": actions}
+
+    def rows(self):
+        strings, actions = self.strings.strings, self.strings.actions
+        for timestamp, elapsed, entry_date, name_id, comment_id, action in self.records():
+            yield [format_timestamp(timestamp), actions[action], strings[name_id],
+                   format_duration(elapsed), format_date(entry_date), strings[comment_id]]
+
+    @instrumentation.timed("binlog.fold")
+    def fold(self):
+        # Same folding as ReplayEngine.apply, on interned ids: name_id -> (elapsed, entry_date)
+        strings = self.strings.strings
+        renamed_from = {}  # comment id -> id of the previous name, or None
+        state = {}
+        empty_name = self.strings.ids.get("")
+        for _, elapsed, entry_date, name_id, comment_id, action in self.records():
+            if action == REMOVE:
+                state.pop(name_id, None)
+            elif action == RENAME:
+                if comment_id not in renamed_from:
+                    comment = strings[comment_id]
+                    old_name = comment[len("Renamed from "):] if comment.startswith("Renamed from ") else ""
+                    renamed_from[comment_id] = self.strings.ids.get(old_name)
+                state.pop(renamed_from[comment_id], None)
+                if name_id != empty_name:
+                    state[name_id] = (elapsed, entry_date)
+            elif name_id != empty_name:
+                state[name_id] = (elapsed, entry_date)
+        return state
+
+    def last_entries(self):
+        strings = self.strings.strings
+        return {strings[name_id]: (format_duration(elapsed), format_date(entry_date))
+                for name_id, (elapsed, entry_date) in self.fold().items()}
+
+    def totals(self):
+        strings = self.strings.strings
+        return {(strings[name_id], format_date(entry_date)): elapsed
+                for name_id, (elapsed, entry_date) in self.fold().items()}
+
+
+def is_up_to_date(csv_path, bin_path=None):
+    bin_path = bin_path or sidecar_path(csv_path)
+    try:
+        with open(bin_path, "rb") as records_file:
+            data = records_file.read(HEADER.size)
+        check_header(data, bin_path)
+        return HEADER.unpack(data)[3] == os.path.getsize(csv_path)
+    except (OSError, ValueError):
+        return False
+
+
+def csv_to_binary(csv_path, bin_path=None):
+    bin_path = bin_path or sidecar_path(csv_path)
+    for path in (bin_path, bin_path + STRINGS_SUFFIX):
+        if os.path.exists(path):
+            os.remove(path)
+    writer = BinaryLogWriter(bin_path)
+    with open(csv_path, newline='') as csv_file:
+        reader = csv.reader(csv_file)
+        next(reader, None)  # Header row
+        batch = []
+        for row in reader:
+            if len(row) != 6:
+                print(f"Skipping row with invalid data formatting: {row}")
+                continue
+            batch.append(row)
+            if len(batch) >= 10000:
+                writer.writerows(batch)
+                batch.clear()
+        writer.writerows(batch)
+    writer.set_source_size(os.path.getsize(csv_path))
+    writer.close()
+    return bin_path
+
+
+def open_sidecar(csv_path):
+    # Writer for the sidecar of a CSV log, rebuilt from the CSV first when it is missing or stale
+    # None when the CSV has rows the sidecar cannot store, as it would never be up to date
+    bin_path = sidecar_path(csv_path)
+    if not is_up_to_date(csv_path, bin_path):
+        csv_to_binary(csv_path, bin_path)
+        if not is_up_to_date(csv_path, bin_path):
+            print(f"{csv_path} has rows the binary log cannot store, not mirroring it.")
+            return None
+    return BinaryLogWriter(bin_path)
+
+
+def binary_to_csv(bin_path, csv_path):
+    with BinaryLogReader(bin_path) as reader, open(csv_path, "w", newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(CSV_HEADERS)
+        writer.writerows(reader.rows())
+    return csv_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert time tracking logs between CSV and the binary format.")
+    parser.add_argument("source", help="a .csv log, or a binary log ending in " + RECORDS_SUFFIX)
+    parser.add_argument("output", nargs="?", help="defaults to the sidecar path or the source without its suffix")
+    args = parser.parse_args(argv)
+    if args.source.endswith(RECORDS_SUFFIX):
+        output = binary_to_csv(args.source, args.output or args.source[:-len(RECORDS_SUFFIX)])
+    else:
+        output = csv_to_binary(args.source, args.output)
+    print(f"Wrote {output}")
+
+
+if __name__ == "__main__":
+    main()
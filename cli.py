@@ -0,0 +1,217 @@
+import argparse
+import os
+import sys
+import time
+
+# Headless front end for scripts, cron jobs and editor plugins. It rebuilds a Session from the log,
+# performs one action and appends the same rows the app would, so both can be used on the same logs.
+# Imports beyond the standard minimum happen inside the commands to keep startup fast; tkinter is
+# never imported.
+LOG_SUFFIX = " - time tracking.csv"
+
+
+def log_path(folder, log):
+    # --log may be a path or a file name in the folder; the default is today's log
+    if log is None:
+        log = time.strftime("%Y-%m-%d") + LOG_SUFFIX
+    return log if os.path.dirname(log) else os.path.join(folder, log)
+
+
+class LogSession:
+    # A Session loaded from one log; rows logged by its actions are appended when it is closed.
+    # Timers the log left running are resolved as the app does (journal.recover_running); the journal
+    # is held until close() so that no instance recovers the same crash meanwhile.
+    def __init__(self, path):
+        import csv
+        from journal import Journal, journal_path, recover_running
+        from model import Session, log_row
+        from replay import CSV_HEADERS, ReplayEngine
+
+        self.path = path
+        self.rows = []
+        self._log_row = log_row
+        try:
+            with open(path, "x", newline="") as csv_file:
+                csv.writer(csv_file).writerow(CSV_HEADERS)
+        except FileExistsError:
+            pass
+        engine = ReplayEngine(path)
+        last_entries = engine.replay()
+        self.session = Session()
+        self.session.load_entries(last_entries, new_entry_for_every_line=True)
+        try:
+            self.journal = Journal(journal_path(path))
+        except (OSError, ValueError):
+            self.journal = None  # In use by a live instance, whose timer simply resumes from the log
+        state = self.journal.read() if self.journal else None
+        recovered = recover_running(self.session, engine.running, state, os.path.basename(path))
+        if recovered:
+            entry, comment = recovered
+            self.rows.append(log_row("Stop", entry, comment, now=state.heartbeat))
+        self.session.log = self.log  # Rebuilding the state from the log must not append to it
+
+    def log(self, action, entry, comment=""):
+        self.rows.append(self._log_row(action, entry, comment))
+
+    def entries_by_name(self):
+        return {entry.name: entry for entry in self.session.entries.values()}
+
+    def entry(self, name, create=False):
+        entry = self.entries_by_name().get(name)
+        if entry is None:
+            if not create:
+                raise SystemExit(f"No entry named {name!r} in {self.path}")
+            entry = self.session.add_entry(name)
+        return entry
+
+    def close(self, write=True):
+        # write=False leaves the log and the journal as they were, e.g. for a crash recovered only on screen
+        if write and self.rows:
+            from log_writer import LogWriter
+            from shared_log import FileLock
+            writer = LogWriter(open(self.path, "a", newline=""), lock=FileLock(self.path))
+            with writer.batch():
+                for row in self.rows:
+                    writer.writerow(row)
+            writer.close()  # Flushes and fsyncs under the log's lock
+        if self.journal:
+            if write:
+                self.journal.clear()  # Any crash is recovered, and no instance runs the timers started here
+            self.journal.close()
+
+
+def print_entries(session):
+    from timecodec import format_duration
+    now = time.time()
+    entries = list(session.entries.values())
+    width = max((len(entry.name) for entry in entries), default=4)
+    for entry in entries:
+        marker = " running" if entry.running else ""
+        print(f"{entry.name:<{width}}  {format_duration(entry.current_elapsed(now))}  {entry.entry_date}{marker}")
+    print(f"{'Total':<{width}}  {format_duration(session.total_time(now))}")
+
+
+def parse_time(text):
+    from timecodec import parse_duration
+    try:
+        return parse_duration(text)
+    except ValueError:
+        raise SystemExit(f"Invalid time {text!r}, expected HH:MM:SS")
+
+
+def command_start(log_session, args):
+    session = log_session.session
+    session.start(log_session.entry(args.name, create=True))
+
+
+def command_stop(log_session, args):
+    session = log_session.session
+    entry = log_session.entry(args.name) if args.name else session.active_entry
+    if entry is None or not entry.running:
+        raise SystemExit("No running entry")
+    session.stop(entry)
+
+
+def command_add_time(log_session, args):
+    log_session.session.add_time(log_session.entry(args.name), parse_time(args.time))
+
+
+def command_remove_time(log_session, args):
+    log_session.session.add_time(log_session.entry(args.name), -parse_time(args.time), action="Remove Time")
+
+
+def command_rename(log_session, args):
+    log_session.session.rename(log_session.entry(args.name), args.new_name)
+
+
+def command_remove(log_session, args):
+    log_session.session.remove_entry(log_session.entry(args.name).id)
+
+
+def command_combine(log_session, args):
+    # Same as selecting the entries in the app; the combined entry takes the first name
+    for name in args.names:
+        log_session.entry(name).selected = True
+    log_session.session.combine_selected_entries()
+
+
+def command_totals(log_session, args):
+    print_entries(log_session.session)
+
+
+def command_report(args):
+    from report import build_report
+    from timecodec import local_timestamp
+    report = build_report(args.folder, args.start, args.end, args.jobs)
+    if args.output:
+        output = args.output if os.path.dirname(args.output) else os.path.join(args.folder, args.output)
+        report.write_csv(output)
+        print(f"Report over {report.log_count} log(s) saved to {output}")
+        return
+    for row in report.rows(local_timestamp()):
+        print("  ".join(row[1:5] + ([row[5]] if row[5] else [])))
+
+
+LOG_COMMANDS = {
+    "start": command_start,
+    "stop": command_stop,
+    "add-time": command_add_time,
+    "remove-time": command_remove_time,
+    "rename": command_rename,
+    "remove": command_remove,
+    "combine": command_combine,
+    "totals": command_totals,
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Time tracking without the window.")
+    parser.add_argument("--folder", default=os.getcwd(), help="working folder, defaults to the current directory")
+    parser.add_argument("--log", help="log file name or path, defaults to today's log in the folder")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("start", help="start an entry, stopping the running one")
+    command.add_argument("name")
+    command = commands.add_parser("stop", help="stop the running entry")
+    command.add_argument("name", nargs="?")
+    for name, help_text in (("add-time", "add time to an entry"), ("remove-time", "remove time from an entry")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("name")
+        command.add_argument("time", help="HH:MM:SS")
+    command = commands.add_parser("rename", help="rename an entry")
+    command.add_argument("name")
+    command.add_argument("new_name")
+    command = commands.add_parser("remove", help="remove an entry")
+    command.add_argument("name")
+    command = commands.add_parser("combine", help="combine entries into the first one")
+    command.add_argument("names", nargs="+")
+    commands.add_parser("totals", help="print the entries of the log and their elapsed times")
+    command = commands.add_parser("serve", help="serve the log as local HTTP/JSON until interrupted")
+    command.add_argument("--port", type=int, default=8765)
+
+    command = commands.add_parser("report", help="per-entry totals over the daily logs of the folder")
+    command.add_argument("--start", help="first date, YYYY-MM-DD")
+    command.add_argument("--end", help="last date, YYYY-MM-DD")
+    command.add_argument("--jobs", type=int, help="worker processes, 1 to fold the logs in this process")
+    command.add_argument("--output", help="write the report as CSV instead of printing it")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == "report":
+        command_report(args)
+        return
+    if args.command == "serve":
+        from server import serve
+        serve(args.folder, args.log, args.port)
+        return
+    log_session = LogSession(log_path(args.folder, args.log))
+    LOG_COMMANDS[args.command](log_session, args)
+    log_session.close(write=args.command != "totals")  # totals is read-only
+    if args.command != "totals":
+        print_entries(log_session.session)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+import argparse
+import csv
+import gzip
+import os
+import shutil
+from datetime import datetime
+
+import binlog
+import instrumentation
+from replay import CSV_HEADERS, ReplayEngine
+from shared_log import FileLock
+
+ARCHIVE_FOLDER = "archive"
+DEFAULT_KEEP_ARCHIVES = 5  # Raw archives kept per log
+
+
+def fold_log(path):
+    # Streams the log once through a ReplayEngine, without its checkpoint. Memory grows with the
+    # number of entries, not with the number of rows.
+    engine = ReplayEngine(path)
+    row_count = 0
+    last_timestamp = ""
+    for row in engine.read_new_rows():
+        if engine.apply(row):
+            row_count += 1
+            last_timestamp = row[0]
+    return engine, row_count, last_timestamp
+
+
+def compacted_rows(engine, row_count, last_timestamp):
+    # One "Latest Status" row per live entry. An entry left running gets a Start row instead, with the
+    # timestamp its elapsed time was logged at, so that the time since then is still counted.
+    for name, (elapsed_time, entry_date) in engine.last_entries.items():
+        started = engine.running.get(name)
+        if started is not None:
+            yield [started, "Start", name, elapsed_time, entry_date, ""]
+        else:
+            yield [last_timestamp, "Latest Status", name, elapsed_time, entry_date,
+                   f"Compacted from {row_count} row(s)"]
+
+
+def archive_log(path, keep=DEFAULT_KEEP_ARCHIVES):
+    # gzip copy of the raw log into the archive folder, keeping the `keep` most recent ones
+    folder, file_name = os.path.split(path)
+    archive_folder = os.path.join(folder, ARCHIVE_FOLDER)
+    os.makedirs(archive_folder, exist_ok=True)
+    archive_path = os.path.join(archive_folder, f"{file_name}.{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.gz")
+    with open(path, "rb") as source, gzip.open(archive_path, "wb") as archive:
+        shutil.copyfileobj(source, archive)
+    archives = sorted(f for f in os.listdir(archive_folder) if f.startswith(file_name + ".") and f.endswith(".gz"))
+    for old_archive in archives[:-keep] if keep > 0 else []:
+        os.remove(os.path.join(archive_folder, old_archive))
+    return archive_path
+
+
+@instrumentation.timed("compact")
+def compact_log(path, keep=DEFAULT_KEEP_ARCHIVES, lock=None):
+    # Rewrites the log as one row per live entry. Runs under the log's lock, so writers that use it
+    # (every LogWriter opened by the app does) wait, then notice the new file and append to it.
+    own_lock = lock is None
+    lock = FileLock(path) if own_lock else lock
+    with lock:
+        engine, row_count, last_timestamp = fold_log(path)
+        archive_path = archive_log(path, keep)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", newline="") as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(CSV_HEADERS)
+            writer.writerows(sorted(compacted_rows(engine, row_count, last_timestamp), key=lambda row: row[0]))
+            csv_file.flush()
+            os.fsync(csv_file.fileno())
+        os.replace(tmp_path, path)
+        ReplayEngine(path).replay(use_checkpoint=False)  # Checkpoint of the new file
+        if os.path.exists(binlog.sidecar_path(path)):
+            try:
+                binlog.csv_to_binary(path)
+            except OSError as e:
+                print(f"Cannot rebuild the binary log of {path}: {e}")
+    if own_lock:
+        lock.close()
+    print(f"Compacted {path}: {row_count} row(s) -> {len(engine.last_entries)}, raw log archived to {archive_path}")
+    return len(engine.last_entries)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Rewrite time tracking logs as one row per live entry, archiving the raw events.")
+    parser.add_argument("logs", nargs="+", help="CSV logs to compact")
+    parser.add_argument("--keep", type=int, default=DEFAULT_KEEP_ARCHIVES,
+                        help="raw archives kept per log in the archive folder")
+    args = parser.parse_args(argv)
+    for path in args.logs:
+        compact_log(path, args.keep)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import tkinter as tk
+
+import instrumentation
+
+ROW_HEIGHT = 36  # Minimum height of a row, the real one is measured on the first row
+ROW_PADDING = 5
+
+
+class EntryListView:
+    # Scrollable list of entries that only creates widgets for the visible rows.
+    # Rows come from `row_factory(canvas)` and are recycled as the list scrolls: every row
+    # must provide `frame`, `bind(entry)` and `unbind()`, the entry state itself stays in the model.
+    def __init__(self, master, session, row_factory):
+        self.session = session
+        self.row_factory = row_factory
+        self.row_height = ROW_HEIGHT
+        self.name_width = 20
+        self.rows = []  # Pool of row widgets
+        self.bound_rows = {}  # entry ID -> row currently showing it
+        self._order = []  # Entry IDs in display order, rebuilt lazily after removals
+        self._order_valid = True
+        self._render_pending = False
+
+        self.canvas = tk.Canvas(master, yscrollincrement=self.row_height)
+        self.scrollbar = tk.Scrollbar(master, orient="vertical", command=self.yview)
+        self.canvas.configure(yscrollcommand=self.scrollbar.set)
+        self.canvas.bind("<Configure>", lambda e: self.render())
+        self.canvas.bind("<MouseWheel>", self.on_mousewheel)
+
+    def pack(self):
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+
+    def order(self):
+        if not self._order_valid:
+            self._order = list(self.session.entries)
+            self._order_valid = True
+        return self._order
+
+    def entry_added(self, entry):
+        if self._order_valid:
+            self._order.append(entry.id)
+        self.schedule_render()
+
+    def entry_removed(self, entry):
+        self._order_valid = False
+        row = self.bound_rows.pop(entry.id, None)
+        if row:
+            row.unbind()
+        self.schedule_render()
+
+    def entries_cleared(self):
+        self._order = []
+        self._order_valid = True
+        for row in self.bound_rows.values():
+            row.unbind()
+        self.bound_rows.clear()
+        self.schedule_render()
+
+    def row_for(self, entry_id):
+        return self.bound_rows.get(entry_id)
+
+    def set_name_width(self, width):
+        self.name_width = width
+        for row in self.rows:
+            row.name_entry.config(width=width)
+
+    def yview(self, *args):
+        self.canvas.yview(*args)
+        self.render()
+
+    def on_mousewheel(self, event):
+        self.yview("scroll", -1 if event.delta > 0 else 1, "units")
+
+    def schedule_render(self):
+        if not self._render_pending:
+            self._render_pending = True
+            self.canvas.after_idle(self.render)
+
+    def _new_row(self):
+        instrumentation.count("entry_list.rows_created")
+        row = self.row_factory(self.canvas)
+        row.name_entry.config(width=self.name_width)
+        row.frame.bind("<MouseWheel>", self.on_mousewheel)
+        row.canvas_item = self.canvas.create_window((0, 0), window=row.frame, anchor="nw", state="hidden")
+        if not self.rows:
+            self.canvas.update_idletasks()
+            self.row_height = max(ROW_HEIGHT, row.frame.winfo_reqheight() + ROW_PADDING)
+            self.canvas.configure(yscrollincrement=self.row_height)
+        self.rows.append(row)
+        return row
+
+    @instrumentation.timed("entry_list.render")
+    def render(self):
+        self._render_pending = False
+        order = self.order()
+        total_height = len(order) * self.row_height
+        self.canvas.configure(scrollregion=(0, 0, self.canvas.winfo_width(), total_height))
+
+        top = max(0, int(self.canvas.canvasy(0)))
+        first = min(top // self.row_height, max(0, len(order) - 1))
+        visible = self.canvas.winfo_height() // self.row_height + 2
+        shown = order[first:first + visible]
+
+        while len(self.rows) < len(shown):
+            self._new_row()
+
+        # Keep rows that still show a visible entry in place, recycle the others
+        shown_ids = set(shown)
+        free_rows = []
+        for row in self.rows:
+            if row.entry is None or row.entry.id not in shown_ids:
+                if row.entry is not None:
+                    self.bound_rows.pop(row.entry.id, None)
+                    row.unbind()
+                free_rows.append(row)
+
+        for index, entry_id in enumerate(shown, start=first):
+            row = self.bound_rows.get(entry_id)
+            if row is None:
+                row = free_rows.pop()
+                row.bind(self.session.entries[entry_id])
+                self.bound_rows[entry_id] = row
+            self.canvas.coords(row.canvas_item, 0, index * self.row_height + ROW_PADDING)
+            self.canvas.itemconfigure(row.canvas_item, state="normal")
+
+        for row in free_rows:
+            self.canvas.itemconfigure(row.canvas_item, state="hidden")
@@ -0,0 +1,121 @@
+import os
+import time
+
+from report import DAILY_LOG_PATTERN
+
+LOG_SUFFIX = ".csv"
+POLL_INTERVAL = 5.0  # Seconds between two looks at the folder
+FULL_RESCAN_INTERVAL = 60.0  # Seconds between rescans that also pick up appends to known files
+
+
+class LogFile:
+    __slots__ = ("name", "date", "size", "mtime")
+
+    def __init__(self, name, size, mtime):
+        self.name = name
+        match = DAILY_LOG_PATTERN.match(name)  # Only daily logs have a date
+        self.date = match.group(1) if match else None
+        self.size = size
+        self.mtime = mtime
+
+
+class FolderIndex:
+    # In-memory index of the CSV logs of a folder, so that listing and opening logs does not hit
+    # the (possibly network mounted) folder every time. poll() compares the folder's mtime and only
+    # lists it again when files were added or removed; sizes and mtimes of the known files are
+    # diffed by a slower full rescan, or on demand with refresh().
+    def __init__(self, folder, poll_interval=POLL_INTERVAL, full_rescan_interval=FULL_RESCAN_INTERVAL):
+        self.folder = folder
+        self.poll_interval = poll_interval
+        self.full_rescan_interval = full_rescan_interval
+        self.files = {}  # name -> LogFile
+        self.folder_mtime = None
+        self.last_poll = self.last_full_rescan = 0.0
+        self.rescan(full=True)
+
+    def __contains__(self, name):
+        return name in self.files
+
+    def names(self):
+        return sorted(self.files)
+
+    def _stat_folder(self):
+        try:
+            return os.stat(self.folder).st_mtime_ns
+        except OSError as e:
+            print(f"Cannot read folder {self.folder}: {e}")
+            return None
+
+    def rescan(self, full=False):
+        # Returns (added, removed, changed) names. Known files are only stat'ed again on a full rescan.
+        now = time.monotonic()
+        self.last_poll = now
+        self.folder_mtime = self._stat_folder()
+        if full:
+            self.last_full_rescan = now
+        seen = set()
+        added, changed = [], []
+        try:
+            with os.scandir(self.folder) as it:
+                for dir_entry in it:
+                    name = dir_entry.name
+                    if not name.endswith(LOG_SUFFIX):
+                        continue
+                    seen.add(name)
+                    known = self.files.get(name)
+                    if known is not None and not full:
+                        continue
+                    try:
+                        if not dir_entry.is_file():
+                            continue
+                        stat = dir_entry.stat()
+                    except OSError:
+                        continue
+                    if known is None:
+                        self.files[name] = LogFile(name, stat.st_size, stat.st_mtime_ns)
+                        added.append(name)
+                    elif known.size != stat.st_size or known.mtime != stat.st_mtime_ns:
+                        known.size, known.mtime = stat.st_size, stat.st_mtime_ns
+                        changed.append(name)
+        except OSError as e:
+            print(f"Cannot list folder {self.folder}: {e}")
+            return [], [], []
+        removed = [name for name in self.files if name not in seen]
+        for name in removed:
+            del self.files[name]
+        return added, removed, changed
+
+    def poll(self, now=None):
+        # Cheap enough to call from the UI tick; returns True when logs were added or removed
+        now = now if now is not None else time.monotonic()
+        if now - self.last_poll < self.poll_interval:
+            return False
+        if now - self.last_full_rescan >= self.full_rescan_interval:
+            added, removed, _ = self.rescan(full=True)
+            return bool(added or removed)
+        self.last_poll = now
+        folder_mtime = self._stat_folder()
+        if folder_mtime is None or folder_mtime == self.folder_mtime:
+            return False
+        added, removed, _ = self.rescan()
+        return bool(added or removed)
+
+    def refresh(self, name):
+        # Stat one file, e.g. before trusting that it exists or after writing to it
+        try:
+            stat = os.stat(os.path.join(self.folder, name))
+        except OSError:
+            self.files.pop(name, None)
+            return None
+        log_file = self.files.get(name)
+        if log_file is None:
+            log_file = self.files[name] = LogFile(name, stat.st_size, stat.st_mtime_ns)
+        else:
+            log_file.size, log_file.mtime = stat.st_size, stat.st_mtime_ns
+        return log_file
+
+    def daily_logs(self, start_date=None, end_date=None):
+        # (date, path) of the dated logs within the inclusive date range, like report.find_daily_logs
+        return sorted((log_file.date, os.path.join(self.folder, log_file.name)) for log_file in self.files.values()
+                      if log_file.date and (not start_date or log_file.date >= start_date)
+                      and (not end_date or log_file.date <= end_date))
@@ -0,0 +1,139 @@
+import atexit
+import cProfile
+import json
+import os
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from functools import wraps
+
+# Timing spans and counters around the hot paths. Everything is a no-op until enable() is called,
+# either from the command line (--profile) or through the TIMETRACKING_PROFILE environment variable:
+#   spans               print span timings and counters at exit
+#   trace[:PATH]        also write the spans as a Chrome/Perfetto trace file
+#   cprofile[:PATH]     run cProfile over the whole session and dump the stats
+# Several modes can be combined with commas, e.g. "trace:load.json,cprofile".
+PROFILE_ENV_VAR = "TIMETRACKING_PROFILE"
+DEFAULT_TRACE_PATH = "time tracking trace.json"
+DEFAULT_CPROFILE_PATH = "time tracking.prof"
+MAX_TRACE_EVENTS = 200000
+
+enabled = False
+counters = Counter()
+span_stats = {}  # name -> [count, total seconds, max seconds]
+_trace_events = None
+_trace_path = None
+_profiler = None
+_profile_path = None
+_lock = threading.Lock()
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+@contextmanager
+def _span(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        duration = end - start
+        with _lock:
+            stats = span_stats.get(name)
+            if stats is None:
+                span_stats[name] = [1, duration, duration]
+            else:
+                stats[0] += 1
+                stats[1] += duration
+                if duration > stats[2]:
+                    stats[2] = duration
+            if _trace_events is not None:
+                _trace_events.append({"name": name, "ph": "X", "ts": start * 1e6, "dur": duration * 1e6,
+                                      "pid": os.getpid(), "tid": threading.get_ident()})
+
+
+def span(name):
+    return _span(name) if enabled else _NULL_SPAN
+
+
+def timed(name):
+    # Decorator form of span(); checks `enabled` at call time since it is applied at import
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            with _span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name, amount=1):
+    if enabled:
+        with _lock:
+            counters[name] += amount
+
+
+def enable(spec="spans"):
+    global enabled, _trace_events, _trace_path, _profiler, _profile_path
+    for mode in filter(None, (part.strip() for part in spec.split(","))):
+        mode, _, path = mode.partition(":")
+        if mode == "trace":
+            _trace_events = deque(maxlen=MAX_TRACE_EVENTS)
+            _trace_path = path or DEFAULT_TRACE_PATH
+        elif mode == "cprofile":
+            if _profiler is None:
+                _profiler = cProfile.Profile()
+                _profiler.enable()
+            _profile_path = path or DEFAULT_CPROFILE_PATH
+        elif mode != "spans":
+            print(f"Unknown profile mode: {mode}")
+            continue
+        if not enabled:
+            enabled = True
+            atexit.register(dump)
+
+
+def enable_from_env():
+    spec = os.environ.get(PROFILE_ENV_VAR)
+    if spec:
+        enable(spec)
+
+
+def summary():
+    lines = [f"{'span':<32} {'count':>8} {'total ms':>12} {'mean ms':>10} {'max ms':>10}"]
+    for name, (calls, total, longest) in sorted(span_stats.items(), key=lambda item: -item[1][1]):
+        lines.append(f"{name:<32} {calls:>8} {total * 1000:>12.2f} {total * 1000 / calls:>10.3f} {longest * 1000:>10.3f}")
+    for name, value in sorted(counters.items()):
+        lines.append(f"{name:<32} {value:>8}")
+    return "\n".join(lines)
+
+
+def dump():
+    global _profiler
+    if not enabled:
+        return
+    print(summary())
+    if _trace_events is not None:
+        with open(_trace_path, "w") as trace_file:
+            json.dump({"traceEvents": list(_trace_events), "otherData": dict(counters)}, trace_file)
+        print(f"Span trace written to {_trace_path}")
+    if _profiler is not None:
+        _profiler.disable()
+        _profiler.dump_stats(_profile_path)
+        _profiler = None
+        print(f"cProfile stats written to {_profile_path}")
+
+
+enable_from_env()
@@ -0,0 +1,141 @@
+import mmap
+import os
+import struct
+import time
+import zlib
+
+import instrumentation
+from shared_log import FileLock
+from timecodec import local_timestamp
+
+# Heartbeat journal of the running timer, next to the log: one fixed-size record in a memory-mapped
+# file, rewritten in place on start/stop and on every tick. The log only gets a row when a timer
+# starts or stops, so after a crash the journal is what tells which entry was running and since when.
+#   magic, version, crc32 of the rest, running flag, start_time, heartbeat, entry name, log name
+# A record whose CRC does not match (torn write) is ignored.
+# The instance that opens the journal holds an exclusive lock on "<journal>.lock" until it closes it:
+# the journal of a log used by a live instance cannot be opened, so it is never taken for a crash.
+JOURNAL_SUFFIX = ".journal"
+MAGIC = b"TTJRNL\x00\x00"
+VERSION = 1
+MAX_NAME_BYTES = 256
+RECORD = struct.Struct(f"<8sIIBddH{MAX_NAME_BYTES}sH{MAX_NAME_BYTES}s")
+FILE_SIZE = 1024
+CRC_OFFSET = 16  # The CRC covers the record from here on, after magic, version and the CRC itself
+
+
+class JournalState:
+    __slots__ = ("running", "start_time", "heartbeat", "name", "log_name")
+
+    def __init__(self, running, start_time, heartbeat, name, log_name):
+        self.running = running
+        self.start_time = start_time  # Epoch seconds, as Entry.start_time: now - start_time is the elapsed time
+        self.heartbeat = heartbeat  # Last time the app was known to be alive
+        self.name = name
+        self.log_name = log_name
+
+
+def _encode(text):
+    data = text.encode("utf-8")
+    if len(data) > MAX_NAME_BYTES:
+        data = data[:MAX_NAME_BYTES]  # Recovery then finds no matching entry and does nothing
+    return len(data), data
+
+
+class Journal:
+    def __init__(self, path):
+        # Raises BlockingIOError when another instance has the journal open
+        self.path = path
+        self.lock = FileLock(path)
+        if not self.lock.acquire(blocking=False):
+            self.lock.close()
+            raise BlockingIOError(f"{path} is in use by another instance")
+        try:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if os.fstat(fd).st_size < FILE_SIZE:
+                    os.ftruncate(fd, FILE_SIZE)
+                self.map = mmap.mmap(fd, FILE_SIZE)
+            finally:
+                os.close(fd)  # The map keeps its own handle
+        except (OSError, ValueError):
+            self.lock.close()
+            raise
+        self.state = None  # Last state written
+        self._payload = bytearray(RECORD.size)
+
+    def read(self):
+        try:
+            fields = RECORD.unpack_from(self.map)
+        except struct.error:
+            return None
+        magic, version, crc, running, start_time, heartbeat, name_length, name, log_length, log_name = fields
+        if magic != MAGIC or version != VERSION or crc != zlib.crc32(self.map[CRC_OFFSET:RECORD.size]):
+            return None
+        return JournalState(bool(running), start_time, heartbeat, name[:name_length].decode("utf-8", "replace"),
+                            log_name[:log_length].decode("utf-8", "replace"))
+
+    def _write(self, state, sync):
+        name_length, name = _encode(state.name)
+        log_length, log_name = _encode(state.log_name)
+        payload = self._payload
+        RECORD.pack_into(payload, 0, MAGIC, VERSION, 0, state.running, state.start_time, state.heartbeat,
+                         name_length, name, log_length, log_name)
+        struct.pack_into("<I", payload, CRC_OFFSET - 4, zlib.crc32(payload[CRC_OFFSET:]))
+        self.map[:RECORD.size] = payload
+        if sync:
+            self.map.flush()  # Only on start/stop; the per-tick heartbeats stay in the page cache
+        self.state = state
+        instrumentation.count("journal.writes")
+
+    def record(self, entry, log_name, now=None):
+        # Entry is the active entry, or None when no timer runs
+        now = now if now is not None else time.time()
+        if entry is not None and entry.running:
+            state = JournalState(True, entry.start_time, now, entry.name, log_name)
+        else:
+            state = JournalState(False, 0.0, now, "", log_name)
+        previous = self.state
+        if previous is not None and (previous.running, previous.start_time, previous.name, previous.log_name) == \
+                (state.running, state.start_time, state.name, state.log_name):
+            return
+        self._write(state, sync=True)
+
+    def clear(self, now=None):
+        # Record a clean stop: nothing to recover on the next start
+        self._write(JournalState(False, 0.0, now if now is not None else time.time(), "",
+                                 self.state.log_name if self.state else ""), sync=True)
+
+    def heartbeat(self, now=None):
+        if self.state is not None and self.state.running:
+            state = self.state
+            self._write(JournalState(True, state.start_time, now if now is not None else time.time(), state.name,
+                                     state.log_name), sync=False)
+
+    def close(self):
+        if not self.map.closed:
+            self.map.close()
+        self.lock.close()  # Releases the lock with its file
+
+
+def journal_path(log_path):
+    return log_path + JOURNAL_SUFFIX
+
+
+def recover_running(session, running, state, log_name):
+    # The rule every front end applies to the timers a log left running, once its entries are loaded.
+    # `running` is ReplayEngine.running and `state` what the journal held when it was opened (a journal
+    # that could be opened has no live owner). A timer is resumed from its last row, except the one
+    # the journal shows running when its instance died: that one is stopped at the last heartbeat, so
+    # that the downtime is not counted. Returns (entry, comment) for the Stop row the caller logs,
+    # stamped at state.heartbeat, or None.
+    crashed = state.name if state and state.running and state.log_name == log_name else None
+    session.resume_running({name: timestamp for name, timestamp in running.items() if name != crashed})
+    if crashed is None:
+        return None
+    entry = next((entry for entry in session.entries.values() if entry.name == crashed), None)
+    elapsed = state.heartbeat - state.start_time
+    if entry is None or entry.running or elapsed <= entry.elapsed_time:
+        return None
+    session.set_elapsed(entry, elapsed)
+    return entry, f"Recovered, last heartbeat {local_timestamp(state.heartbeat)}"
@@ -0,0 +1,110 @@
+import queue
+import threading
+import traceback
+
+import instrumentation
+
+BATCH_SIZE = 200  # Entries handed to the UI per batch
+POLL_MS = 20  # How often the UI drains the queue while a load runs
+
+
+class LogLoader:
+    # Runs a storage load on a worker thread and feeds the results back to the Tk thread in batches
+    # through a queue drained with after(). Starting a new load cancels the running one.
+    def __init__(self, root, batch_size=BATCH_SIZE, poll_ms=POLL_MS):
+        self.root = root
+        self.batch_size = batch_size
+        self.poll_ms = poll_ms
+        self.queue = queue.Queue()
+        self.generation = 0  # Identifies the current load, results of older loads are dropped
+        self.cancel_event = None
+        self.thread = None
+        self.on_batch = self.on_done = None
+
+    def start(self, load, on_batch, on_done=None):
+        # load(should_stop) runs on the worker and returns {name: (elapsed_time, entry_date)}
+        self.cancel()
+        self.generation += 1
+        self.cancel_event = threading.Event()
+        self.on_batch, self.on_done = on_batch, on_done
+        self.thread = threading.Thread(target=self._work, args=(load, self.generation, self.cancel_event),
+                                       name="log loader", daemon=True)
+        self.thread.start()
+        self.root.after(self.poll_ms, self.drain)
+
+    def cancel(self):
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+            self.cancel_event = None
+
+    def _work(self, load, generation, cancel_event):
+        try:
+            with instrumentation.span("loader.load"):
+                last_entries = load(cancel_event.is_set)
+            batch = []
+            for item in last_entries.items():
+                if cancel_event.is_set():
+                    return
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    self.queue.put((generation, "batch", batch))
+                    batch = []
+            if batch:
+                self.queue.put((generation, "batch", batch))
+            self.queue.put((generation, "done", None))
+        except Exception as e:
+            traceback.print_exc()
+            self.queue.put((generation, "error", e))
+
+    def drain(self):
+        # Runs on the Tk thread
+        while True:
+            try:
+                generation, kind, payload = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if generation != self.generation or self.cancel_event is None:
+                continue  # Cancelled load
+            if kind == "batch":
+                self.on_batch(payload)
+            else:
+                self.cancel_event = None
+                if kind == "error":
+                    print(f"Failed to load CSV file: {payload}")
+                elif self.on_done:
+                    self.on_done()
+                return
+        if self.cancel_event is not None:
+            self.root.after(self.poll_ms, self.drain)
+
+    def wait(self):
+        # Block until the current load is finished and hand all its results to the UI
+        if self.thread:
+            self.thread.join()
+        self.drain()
+
+
+def run_in_thread(root, work, on_done=None, poll_ms=POLL_MS):
+    # Runs work() on a worker thread and hands its result to on_done on the Tk thread, polled with after()
+    results = queue.Queue()
+
+    def target():
+        try:
+            results.put((True, work()))
+        except Exception as e:
+            traceback.print_exc()
+            results.put((False, e))
+
+    def poll():
+        try:
+            ok, result = results.get_nowait()
+        except queue.Empty:
+            root.after(poll_ms, poll)
+            return
+        if on_done:
+            on_done(ok, result)
+
+    thread = threading.Thread(target=target, name="background task", daemon=True)
+    thread.start()
+    root.after(poll_ms, poll)
+    return thread
@@ -0,0 +1,164 @@
+import csv
+import os
+import time
+from contextlib import contextmanager, nullcontext
+
+import binlog
+import instrumentation
+
+# Durability modes: when buffered rows are written out to the CSV file
+FLUSH_EVERY_ROWS = "rows"  # Flush once `rows` rows are buffered
+FLUSH_EVERY_INTERVAL = "interval"  # Flush when the oldest buffered row is `interval_ms` old
+FSYNC_ON_STOP = "stop"  # Flush and fsync when a timer is stopped
+
+DEFAULT_DURABILITY = "interval:1000"
+DURABILITY_ENV_VAR = "TIMETRACKING_DURABILITY"
+
+
+def parse_durability(spec):
+    # "rows:50", "interval:500" or "stop"
+    mode, _, value = (spec or DEFAULT_DURABILITY).strip().partition(":")
+    if mode == FLUSH_EVERY_ROWS:
+        return mode, int(value or 1)
+    if mode == FLUSH_EVERY_INTERVAL:
+        return mode, int(value or 1000)
+    if mode == FSYNC_ON_STOP:
+        return mode, None
+    raise ValueError(f"Unknown durability mode: {spec}")
+
+
+def durability_from_env():
+    try:
+        return parse_durability(os.environ.get(DURABILITY_ENV_VAR))
+    except ValueError as e:
+        print(f"{e}, using {DEFAULT_DURABILITY}")
+        return parse_durability(DEFAULT_DURABILITY)
+
+
+class LogWriter:
+    # Write-behind buffer in front of an append-only CSV file.
+    # Rows are kept in memory until the durability mode asks for a flush; `poll()` must be
+    # called regularly (the app tick does it) for the interval mode to flush idle buffers.
+    # `mirror` is an optional binlog.BinaryLogWriter that receives the same rows. Before appending, it is
+    # caught up with the rows other writers added to the file since, or rebuilt when the file was replaced.
+    # `lock` (a shared_log.FileLock) is held around every flush when other processes append to the same file.
+    def __init__(self, csv_file, mode=FLUSH_EVERY_INTERVAL, value=1000, mirror=None, lock=None):
+        self.csv_file = csv_file
+        self.writer = csv.writer(csv_file)
+        self.mirror = mirror
+        self.lock = lock
+        self.mode = mode
+        self.value = value
+        self.buffer = []
+        self.first_buffered_at = None
+        self.batch_depth = 0
+        self.flush_count = 0
+
+    @property
+    def closed(self):
+        return self.csv_file.closed
+
+    def writerow(self, row):
+        if not self.buffer:
+            self.first_buffered_at = time.monotonic()
+        self.buffer.append(row)
+        if not self.batch_depth:
+            self._maybe_flush(row)
+
+    @contextmanager
+    def batch(self):
+        # Rows written inside the block are committed together when it exits
+        self.batch_depth += 1
+        try:
+            yield self
+        finally:
+            self.batch_depth -= 1
+            if not self.batch_depth and self.buffer:
+                self._maybe_flush(self.buffer[-1], whole_batch=True)
+
+    def _maybe_flush(self, last_row, whole_batch=False):
+        if self.mode == FLUSH_EVERY_ROWS:
+            if len(self.buffer) >= self.value:
+                self.flush()
+        elif self.mode == FLUSH_EVERY_INTERVAL:
+            if whole_batch or self._interval_elapsed():
+                self.flush()
+        elif self.mode == FSYNC_ON_STOP:
+            if last_row[1] == "Stop" or (whole_batch and any(row[1] == "Stop" for row in self.buffer)):
+                self.flush(sync=True)
+
+    def _interval_elapsed(self):
+        return (time.monotonic() - self.first_buffered_at) * 1000 >= self.value
+
+    def poll(self):
+        if self.buffer and not self.batch_depth and self.mode == FLUSH_EVERY_INTERVAL and self._interval_elapsed():
+            self.flush()
+
+    @instrumentation.timed("log_writer.flush")
+    def flush(self, sync=False):
+        instrumentation.count("log_writer.flushes")
+        with self.lock if self.lock else nullcontext():
+            if self.lock and self.buffer:
+                self._follow_replaced_file()
+            wrote = bool(self.buffer)
+            if wrote:
+                instrumentation.count("log_writer.rows", len(self.buffer))
+                if self.mirror:
+                    self._sync_mirror()
+                self.writer.writerows(self.buffer)
+                if self.mirror:
+                    self.mirror.writerows(self.buffer)
+                self.buffer.clear()
+                self.first_buffered_at = None
+                self.flush_count += 1
+            self.csv_file.flush()  # Before the lock is released
+            if sync:
+                os.fsync(self.csv_file.fileno())
+                instrumentation.count("log_writer.fsyncs")
+            if self.mirror and wrote:
+                if self.mirror.complete:
+                    # Still under the lock: the size ends with this writer's rows, not with a later writer's
+                    self.mirror.set_source_size(os.fstat(self.csv_file.fileno()).st_size)
+                    self.mirror.flush()
+                else:
+                    print(f"{self.csv_file.name} has rows the binary log cannot store, not mirroring it.")
+                    self.mirror.close()
+                    self.mirror = None
+
+    def _sync_mirror(self):
+        size = os.fstat(self.csv_file.fileno()).st_size
+        if self.mirror.source_size != size and not self.mirror.catch_up(self.csv_file.name, size):
+            self._reopen_mirror()
+
+    def _reopen_mirror(self):
+        # Rebuilt from the CSV when it is not up to date
+        self.mirror.close()
+        try:
+            self.mirror = binlog.open_sidecar(self.csv_file.name)
+        except (OSError, ValueError) as e:
+            print(f"Cannot write binary log next to {self.csv_file.name}: {e}")
+            self.mirror = None
+
+    def _follow_replaced_file(self):
+        # Another process may have compacted the log, i.e. renamed a new file over the one we have open
+        path = self.csv_file.name
+        try:
+            replaced = os.stat(path).st_ino != os.fstat(self.csv_file.fileno()).st_ino
+        except OSError:
+            return
+        if replaced:
+            print(f"{path} was replaced, reopening it.")
+            self.csv_file.close()
+            self.csv_file = open(path, "a", newline="")
+            self.writer = csv.writer(self.csv_file)
+            if self.mirror:
+                self._reopen_mirror()  # Its records describe the old file; compact_log rebuilt the sidecar
+
+    def close(self):
+        if not self.csv_file.closed:
+            self.flush(sync=True)
+            self.csv_file.close()
+            if self.mirror:
+                self.mirror.close()
+            if self.lock:
+                self.lock.close()
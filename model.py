@@ -0,0 +1,237 @@
+import csv
+import time
+
+from replay import CSV_HEADERS
+from timecodec import format_duration, local_date, local_timestamp, parse_duration, parse_local_timestamp
+
+
+def log_row(action, entry, comment="", now=None):
+    return [local_timestamp(now), action, entry.name, format_duration(entry.current_elapsed(now)), entry.entry_date,
+            comment]
+
+
+class Entry:
+    # Plain state of one stopwatch entry, independent of any widget
+    __slots__ = ("id", "name", "elapsed_time", "entry_date", "running", "start_time", "selected")
+
+    def __init__(self, entry_id, name="", elapsed_time=0, entry_date=None):
+        self.id = entry_id
+        self.name = name
+        self.elapsed_time = elapsed_time  # Seconds, only up to date while the entry is stopped
+        self.entry_date = entry_date or local_date()
+        self.running = False
+        self.start_time = None
+        self.selected = False
+
+    def current_elapsed(self, now=None):
+        if self.running:
+            return (now if now is not None else time.time()) - self.start_time
+        return self.elapsed_time
+
+    def add_time(self, seconds):
+        self.elapsed_time += seconds
+        if self.running:
+            self.start_time -= seconds
+
+
+class Session:
+    # All the entries of one tracking session and the operations the UI buttons perform on them.
+    # `log` is called as log(action, entry, comment) for every action that goes to the CSV log and
+    # `listener` (usually the Tk app) is told about added, removed and changed entries.
+    # Elapsed times must be changed through the session so that the running total stays correct.
+    __slots__ = ("entries", "active_entry", "rename_map", "first_entry_date", "entry_counter", "log", "listener",
+                 "elapsed_total")
+
+    def __init__(self, log=None, listener=None):
+        self.entries = {}  # Entries by ID, in creation order
+        self.active_entry = None
+        self.rename_map = {}  # Map entry IDs to base names
+        self.first_entry_date = None
+        self.entry_counter = 0  # Counter to generate unique IDs
+        self.elapsed_total = 0  # Sum of the stored elapsed times, kept up to date incrementally
+        self.log = log
+        self.listener = listener
+
+    def _log(self, action, entry, comment=""):
+        if self.log:
+            self.log(action, entry, comment)
+
+    def _changed(self, entry):
+        if self.listener:
+            self.listener.entry_changed(entry)
+
+    def add_entry(self, name="", elapsed_time="00:00:00", entry_date=None):
+        if not self.first_entry_date:
+            self.first_entry_date = local_date()
+        entry = Entry(self.entry_counter, name, parse_duration(elapsed_time), entry_date or self.first_entry_date)
+        self.entry_counter += 1
+        self.entries[entry.id] = entry
+        self.rename_map[entry.id] = name
+        self.elapsed_total += entry.elapsed_time
+        if self.listener:
+            self.listener.entry_added(entry)
+        return entry
+
+    def remove_entry(self, entry_id, comment="", log=True):
+        entry = self.entries.pop(entry_id, None)
+        if entry:
+            if self.active_entry is entry:
+                self.active_entry = None
+            self.rename_map.pop(entry_id, None)
+            self.elapsed_total -= entry.elapsed_time
+            if self.listener:
+                self.listener.entry_removed(entry)
+            if log:
+                self._log("Remove", entry, comment)
+        return entry
+
+    def clear_entries(self):
+        self.entries.clear()
+        self.rename_map.clear()
+        self.active_entry = None
+        self.elapsed_total = 0
+        if self.listener:
+            self.listener.entries_cleared()
+
+    def load_entries(self, last_entries, new_entry_for_every_line=False, existing_entries=None):
+        # existing_entries lets a load that arrives in batches compute the (name, date) set only once
+        if existing_entries is None:
+            existing_entries = self.existing_entries()
+        added = []
+        for name, (elapsed_time, entry_date) in last_entries.items():
+            if ((name, entry_date) not in existing_entries) or new_entry_for_every_line:
+                added.append(self.add_entry(name, elapsed_time, entry_date))
+        return added
+
+    def sync_entries(self, changed, removed):
+        # Apply the entry states other instances sharing the log wrote to it (see ReplayEngine.tail).
+        # Nothing is logged, the rows are already in the file, and an entry running here keeps its timer.
+        by_name = {entry.name: entry for entry in self.entries.values()}
+        for name, (elapsed_time, entry_date) in changed.items():
+            entry = by_name.get(name)
+            if entry is None:
+                self.add_entry(name, elapsed_time, entry_date)
+            elif not entry.running and elapsed_time != format_duration(entry.elapsed_time):
+                self._set_elapsed(entry, parse_duration(elapsed_time))
+                self._changed(entry)
+        for name in removed:
+            entry = by_name.get(name)
+            if entry is not None and not entry.running:
+                self.remove_entry(entry.id, log=False)
+
+    def existing_entries(self):
+        return {(entry.name, entry.entry_date) for entry in self.entries.values()}
+
+    def selected_entries(self):
+        return [entry for entry in self.entries.values() if entry.selected]
+
+    def total_time(self, now=None):
+        total = self.elapsed_total
+        active = self.active_entry
+        if active is not None and active.running:
+            total += active.current_elapsed(now) - active.elapsed_time
+        return total
+
+    def _set_elapsed(self, entry, seconds):
+        self.elapsed_total += seconds - entry.elapsed_time
+        entry.elapsed_time = seconds
+
+    def set_elapsed(self, entry, seconds):
+        # Set the elapsed time of a stopped entry without logging, for time recovered from outside the log
+        self._set_elapsed(entry, seconds)
+        self._changed(entry)
+
+    def start(self, entry, now=None):
+        if entry.running:
+            return
+        now = now if now is not None else time.time()
+        if self.active_entry and self.active_entry is not entry:
+            self.stop(self.active_entry, now)
+        self.active_entry = entry
+        entry.running = True
+        entry.start_time = now - entry.elapsed_time
+        self._changed(entry)
+        self._log("Start", entry)
+
+    def resume(self, entry, since):
+        # Mark an entry as running since `since` (epoch seconds) without logging a Start, when the
+        # session is rebuilt from a log or journal in which its timer was left running
+        if self.active_entry and self.active_entry is not entry:
+            self.stop(self.active_entry, since)
+        self.active_entry = entry
+        entry.running = True
+        entry.start_time = since - entry.elapsed_time
+        self._changed(entry)
+
+    def resume_running(self, running):
+        # Resume the entries a log left running, from ReplayEngine.running (name -> timestamp of the last row)
+        by_name = {entry.name: entry for entry in self.entries.values()}
+        for name, timestamp in running.items():
+            entry = by_name.get(name)
+            if entry is not None:
+                self.resume(entry, parse_local_timestamp(timestamp))
+
+    def stop(self, entry, now=None):
+        if not entry.running:
+            return
+        now = now if now is not None else time.time()
+        self._set_elapsed(entry, now - entry.start_time)
+        entry.running = False
+        if self.active_entry is entry:
+            self.active_entry = None
+        self._changed(entry)
+        self._log("Stop", entry)
+
+    def reset(self, entry):
+        entry.running = False
+        entry.start_time = None
+        self._set_elapsed(entry, 0)
+        if self.active_entry is entry:
+            self.active_entry = None
+        self._changed(entry)
+
+    def rename(self, entry, new_name):
+        base_name = self.rename_map.get(entry.id, entry.name)
+        entry.name = new_name
+        self._log("Rename", entry, f"Renamed from {base_name}")
+        self.rename_map[entry.id] = new_name  # Later renames start from the current name
+        self._changed(entry)
+
+    def add_time(self, entry, seconds, action="Add Time"):
+        entry.add_time(seconds)
+        self.elapsed_total += seconds
+        self._changed(entry)
+        self._log(action, entry)
+
+    def add_time_to_selected(self, seconds):
+        for entry in self.selected_entries():
+            self.add_time(entry, seconds)
+
+    def remove_time_from_selected(self, seconds):
+        for entry in self.selected_entries():
+            self.add_time(entry, -seconds, action="Remove Time")
+
+    def combine_selected_entries(self, now=None):
+        selected_entries = self.selected_entries()
+        if not selected_entries:
+            return None
+
+        combined_name = selected_entries[0].name
+        total_elapsed_time = sum(entry.current_elapsed(now) for entry in selected_entries)
+
+        for entry in selected_entries:
+            self.remove_entry(entry.id, comment=f"Merged into {combined_name}")
+
+        new_entry = self.add_entry(name=combined_name, elapsed_time=format_duration(total_elapsed_time))
+        self._log("Combine", new_entry, "Combined entry")
+        return new_entry
+
+    def simplified_rows(self, now=None):
+        for entry in self.entries.values():
+            yield log_row("Latest Status", entry, now=now)
+
+    def write_simplified_csv(self, file_path, now=None):
+        with open(file_path, 'w', newline='') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(CSV_HEADERS)
+            writer.writerows(self.simplified_rows(now))
@@ -0,0 +1,203 @@
+import csv
+import json
+import locale
+import os
+import threading
+import zlib
+
+import instrumentation
+
+CSV_HEADERS = ["Timestamp", "Action", "Name", "Elapsed Time", "Entry Date", "Comment"]
+CHECKPOINT_SUFFIX = ".checkpoint"
+CHECKPOINT_VERSION = 4
+TAIL_CHECK_BYTES = 256  # Bytes before the checkpoint offset used to detect rewritten files
+STOP_CHECK_ROWS = 1024  # Rows between two checks of the should_stop callback
+
+
+class ReplayEngine:
+    # Folds the action log of one CSV file into the latest state of every entry.
+    # The folded state is checkpointed next to the CSV so that reopening the file
+    # only has to read the rows appended since the last replay.
+    def __init__(self, file_path, encoding=None):
+        self.file_path = file_path
+        self.checkpoint_path = file_path + CHECKPOINT_SUFFIX
+        self.encoding = encoding or locale.getpreferredencoding(False)
+        self.lock = threading.Lock()  # Replays may run on a loader thread
+        self.reset()
+
+    def reset(self):
+        self.offset = 0
+        self.last_entries = {}
+        self.running = {}  # Name -> timestamp of its last row, for entries whose timer was left running
+        self._saved_crc = None
+
+    def apply(self, row):
+        if len(row) != 6:
+            print(f"Skipping row with invalid data formatting: {row}")
+            return False
+        action, name, elapsed_time, entry_date, comment = row[1], row[2], row[3], row[4], row[5]
+        running = self.running
+        if action == "Remove":
+            self.last_entries.pop(name, None)
+            running.pop(name, None)
+        elif action == "Rename":
+            old_name = comment.split("Renamed from ", 1)[1] if comment.startswith("Renamed from ") else ""
+            self.last_entries.pop(old_name, None)
+            was_running = running.pop(old_name, None) is not None
+            # Keep the renamed entry even when its previous name was never seen in this log
+            if name:
+                self.last_entries[name] = (elapsed_time, entry_date)
+                if was_running:
+                    running[name] = row[0]
+        elif name == '':
+            print(f"Skipping row with missing name: {row}")
+            return False
+        else:
+            self.last_entries[name] = (elapsed_time, entry_date)
+            # A running entry has been running since its last row, with the elapsed time of that row
+            if action == "Start" or (name in running and action != "Stop"):
+                running[name] = row[0]
+            elif action == "Stop":
+                running.pop(name, None)
+        return True
+
+    @instrumentation.timed("replay")
+    def replay(self, use_checkpoint=True, should_stop=None):
+        # should_stop() is polled every STOP_CHECK_ROWS rows; a stopped replay keeps (and checkpoints)
+        # what it has read so far, the next replay continues from there.
+        with self.lock:
+            if use_checkpoint and self.offset == 0:
+                self.load_checkpoint()
+            elif not self._offset_is_valid():
+                print(f"{self.file_path} was rewritten, replaying it from the start.")
+                self.reset()
+
+            start_offset = self.offset
+            parsed = skipped = 0
+            for row in self.read_new_rows():
+                parsed += 1
+                if not self.apply(row):
+                    skipped += 1
+                if should_stop and parsed % STOP_CHECK_ROWS == 0 and should_stop():
+                    break
+            instrumentation.count("replay.rows_parsed", parsed)
+            instrumentation.count("replay.rows_skipped", skipped)
+            if self.offset != start_offset:
+                self.save_checkpoint()
+            return dict(self.last_entries)
+
+    def tail(self):
+        # Rows appended since the last replay, e.g. by other instances sharing the file. Returns the
+        # states of the entries they touched and the names they removed, or None while a replay
+        # runs on another thread or before the first one.
+        if self.offset == 0 or not self.lock.acquire(blocking=False):
+            return None
+        try:
+            if not self._offset_is_valid():
+                print(f"{self.file_path} was rewritten, replaying it from the start.")
+                touched = set(self.last_entries)
+                self.reset()
+            else:
+                touched = set()
+            start_offset = self.offset
+            for row in self.read_new_rows():
+                if self.apply(row):
+                    touched.add(row[2])
+                    if row[1] == "Rename" and row[5].startswith("Renamed from "):
+                        touched.add(row[5].split("Renamed from ", 1)[1])
+            if self.offset != start_offset:
+                self.save_checkpoint()
+            changed = {name: self.last_entries[name] for name in touched if name in self.last_entries}
+            removed = [name for name in touched if name not in self.last_entries]
+            return changed, removed
+        finally:
+            self.lock.release()
+
+    def read_new_rows(self):
+        # Yields the rows appended after self.offset, advancing the offset after each row.
+        # A trailing line without a line terminator is still being written and is left for later.
+        try:
+            csv_file = open(self.file_path, "rb")
+        except OSError as e:
+            print(f"Cannot read CSV file {self.file_path}: {e}")
+            return
+        with csv_file:
+            csv_file.seek(self.offset)
+            consumed = [self.offset]
+
+            def lines():
+                for raw in csv_file:
+                    if not raw.endswith(b"\n"):
+                        return
+                    consumed[0] += len(raw)
+                    yield raw.decode(self.encoding, errors="replace")
+
+            reader = csv.reader(lines())
+            try:
+                for row in reader:
+                    at_header = self.offset == 0
+                    self.offset = consumed[0]
+                    if at_header:
+                        continue  # Header row
+                    yield row
+            except csv.Error as e:
+                print(f"Stopped reading {self.file_path} at byte {self.offset}: {e}")
+
+    def _tail_crc(self, offset):
+        start = max(0, offset - TAIL_CHECK_BYTES)
+        with open(self.file_path, "rb") as csv_file:
+            csv_file.seek(start)
+            data = csv_file.read(offset - start)
+        if len(data) != offset - start:
+            return None
+        return zlib.crc32(data)
+
+    def _offset_is_valid(self):
+        if self.offset == 0:
+            return True
+        try:
+            return self._tail_crc(self.offset) == self._saved_crc
+        except OSError:
+            return False
+
+    def load_checkpoint(self):
+        self.reset()
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as checkpoint_file:
+                checkpoint = json.load(checkpoint_file)
+            if checkpoint.get("version") != CHECKPOINT_VERSION:
+                return False
+            offset = int(checkpoint["offset"])
+            if self._tail_crc(offset) != checkpoint["tail_crc"]:
+                print(f"Checkpoint for {self.file_path} does not match the file, replaying it from the start.")
+                return False
+            self.offset = offset
+            self._saved_crc = checkpoint["tail_crc"]
+            self.last_entries = {name: tuple(state) for name, state in checkpoint["last_entries"].items()}
+            self.running = checkpoint["running"]
+            return True
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Ignoring unreadable checkpoint {self.checkpoint_path}: {e}")
+            self.reset()
+            return False
+
+    def save_checkpoint(self):
+        try:
+            self._saved_crc = self._tail_crc(self.offset)
+            checkpoint = {
+                "version": CHECKPOINT_VERSION,
+                "offset": self.offset,
+                "tail_crc": self._saved_crc,
+                "last_entries": self.last_entries,
+                "running": self.running,
+            }
+            # Several processes, and threads of one (the loader, the API server's /history), may save the
+            # checkpoint of the same file at once
+            tmp_path = f"{self.checkpoint_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as checkpoint_file:
+                json.dump(checkpoint, checkpoint_file)
+            os.replace(tmp_path, self.checkpoint_path)
+        except OSError as e:
+            print(f"Failed to save checkpoint {self.checkpoint_path}: {e}")
@@ -0,0 +1,133 @@
+import argparse
+import csv
+import multiprocessing
+import os
+import re
+import threading
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import binlog
+import instrumentation
+from replay import CSV_HEADERS, ReplayEngine
+from timecodec import format_duration, local_timestamp, parse_date, parse_duration
+
+DAILY_LOG_PATTERN = re.compile(r"^(\d{4}-\d{2}-\d{2}) - time tracking\.csv$")
+
+
+def find_daily_logs(folder, start_date=None, end_date=None):
+    # (date, path) of every "YYYY-MM-DD - time tracking.csv" in the folder, inclusive date range
+    logs = []
+    with os.scandir(folder) as it:
+        for dir_entry in it:
+            match = DAILY_LOG_PATTERN.match(dir_entry.name)
+            if not match or not dir_entry.is_file():
+                continue
+            log_date = match.group(1)
+            if (start_date and log_date < start_date) or (end_date and log_date > end_date):
+                continue
+            logs.append((log_date, dir_entry.path))
+    logs.sort()
+    return logs
+
+
+def fold_log(path):
+    # Runs in a worker process: stream one log and return its per-entry totals in seconds
+    if binlog.is_up_to_date(path):
+        with binlog.BinaryLogReader(binlog.sidecar_path(path)) as reader:
+            return reader.totals()
+    totals = {}
+    for name, (elapsed_time, entry_date) in ReplayEngine(path).replay().items():
+        try:
+            parse_date(entry_date)
+            totals[(name, entry_date)] = parse_duration(elapsed_time)
+        except ValueError:
+            print(f"Skipping entry with invalid elapsed time or date in {path}: {name} {elapsed_time} {entry_date}")
+    return totals
+
+
+class Report:
+    # Per-entry totals merged over many daily logs
+    def __init__(self):
+        self.by_entry = defaultdict(int)  # (name, entry_date) -> seconds
+        self.by_name = defaultdict(int)  # name -> seconds
+        self.dates_by_name = defaultdict(set)
+        self.log_count = 0
+
+    def merge(self, totals):
+        self.log_count += 1
+        for (name, entry_date), seconds in totals.items():
+            self.by_entry[(name, entry_date)] += seconds
+            self.by_name[name] += seconds
+            self.dates_by_name[name].add(entry_date)
+
+    def rows(self, timestamp):
+        for (name, entry_date), seconds in sorted(self.by_entry.items(), key=lambda item: (item[0][1], item[0][0])):
+            yield [timestamp, "Latest Status", name, format_duration(seconds), entry_date, ""]
+        for name, seconds in sorted(self.by_name.items()):
+            dates = sorted(self.dates_by_name[name])
+            yield [timestamp, "Total", name, format_duration(seconds), "",
+                   f"{len(dates)} day(s) from {dates[0]} to {dates[-1]}"]
+
+    def write_csv(self, file_path):
+        timestamp = local_timestamp()
+        with open(file_path, 'w', newline='') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(CSV_HEADERS)
+            writer.writerows(self.rows(timestamp))
+
+
+def pool_context():
+    # Forking copies the locks other threads hold at that moment, so only fork from a single-threaded
+    # process (the CLI); the app builds reports on a worker thread and starts clean workers instead
+    if threading.active_count() == 1 or "forkserver" not in multiprocessing.get_all_start_methods():
+        return None
+    return multiprocessing.get_context("forkserver")
+
+
+@instrumentation.timed("report.build")
+def build_report(folder, start_date=None, end_date=None, jobs=None, logs=None):
+    # logs: (date, path) of the daily logs to merge if already known, e.g. from a FolderIndex
+    if logs is None:
+        logs = find_daily_logs(folder, start_date, end_date)
+    paths = [path for _, path in logs]
+    report = Report()
+    if jobs == 1 or len(paths) < 2:
+        for path in paths:
+            report.merge(fold_log(path))
+    else:
+        # Each worker streams whole files, only the small per-file totals come back
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=pool_context()) as executor:
+            for totals in executor.map(fold_log, paths, chunksize=max(1, len(paths) // 64)):
+                report.merge(totals)
+    return report
+
+
+def report_file_name(start_date=None, end_date=None):
+    timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+    date_range = f" {start_date or 'start'} to {end_date or 'end'}" if start_date or end_date else ""
+    return f"{timestamp} report{date_range} - time tracking.csv"
+
+
+def save_report(folder, start_date=None, end_date=None, jobs=None, output=None, logs=None):
+    report = build_report(folder, start_date, end_date, jobs, logs)
+    output = output or os.path.join(folder, report_file_name(start_date, end_date))
+    report.write_csv(output)
+    print(f"Report over {report.log_count} log(s) saved to {output}")
+    return output
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge the daily time tracking logs of a folder into one summary CSV.")
+    parser.add_argument("folder", nargs="?", default=os.getcwd())
+    parser.add_argument("--from", dest="start_date", help="first day to include, YYYY-MM-DD")
+    parser.add_argument("--to", dest="end_date", help="last day to include, YYYY-MM-DD")
+    parser.add_argument("--jobs", type=int, default=None, help="number of worker processes")
+    parser.add_argument("--output", help="path of the summary CSV")
+    args = parser.parse_args(argv)
+    save_report(args.folder, args.start_date, args.end_date, args.jobs, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,414 @@
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import os
+import queue
+import threading
+import time
+from contextlib import nullcontext
+from urllib.parse import parse_qs, urlsplit
+
+import instrumentation
+from model import Session, log_row
+from timecodec import format_duration, parse_duration
+
+# Local HTTP/JSON API over the tracker state, for dashboards and other tools.
+#   GET  /entries                 entries, running entry and total, live
+#   GET  /total                   total elapsed time only
+#   GET  /history?start=&end=     per-entry totals over the daily logs of the folder
+#   POST /start {"name"}          /stop {"name"?}          /combine {"names": [...]}
+#   POST /add-time /remove-time {"name", "time": "HH:MM:SS" or "seconds"}
+# Reads are answered on the server thread from an immutable snapshot that the owner of the Session
+# publishes when it changes; mutations are queued and applied by the owner (the Tk thread, or the
+# serve loop) so that the log keeps a single writer.
+# Only local tools may call it: browsers send an Origin header with cross-site requests and DNS rebinding
+# gives them another Host, so requests with either are refused, and POST bodies must be JSON, which a
+# page cannot send cross-site without a preflight.
+SERVER_ENV_VAR = "TIMETRACKING_SERVER"  # Port to serve on from the app, unset to disable
+HOST = "127.0.0.1"  # Local only
+DEFAULT_PORT = 8765
+POLL_MS = 50  # How often the owner applies queued mutations
+MUTATION_TIMEOUT = 5.0
+START_TIMEOUT = 5.0  # How long start_thread waits for the socket to be bound
+ALLOWED_HOSTS = ("127.0.0.1", "localhost")
+REASONS = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed",
+           415: "Unsupported Media Type", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+def port_from_env():
+    value = os.environ.get(SERVER_ENV_VAR)
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        print(f"Invalid {SERVER_ENV_VAR} port {value}, using {DEFAULT_PORT}")
+        return DEFAULT_PORT
+
+
+class Snapshot:
+    # Entry state at one point in time; running times are brought up to date when read
+    __slots__ = ("entries", "elapsed_total", "active_id", "active_elapsed", "active_start")
+
+    def __init__(self, session):
+        self.entries = tuple((entry.id, entry.name, entry.elapsed_time, entry.entry_date, entry.running,
+                              entry.start_time) for entry in session.entries.values())
+        self.elapsed_total = session.elapsed_total
+        active = session.active_entry
+        running = active is not None and active.running
+        self.active_id = active.id if running else None
+        self.active_elapsed = active.elapsed_time if running else 0
+        self.active_start = active.start_time if running else None
+
+    def entry_dicts(self, now):
+        for entry_id, name, elapsed_time, entry_date, running, start_time in self.entries:
+            seconds = now - start_time if running else elapsed_time
+            yield {"id": entry_id, "name": name, "seconds": int(seconds), "elapsed": format_duration(seconds),
+                   "entry_date": entry_date, "running": running}
+
+    def total(self, now):
+        if self.active_start is None:
+            return self.elapsed_total
+        return self.elapsed_total + now - self.active_start - self.active_elapsed
+
+
+class DirtyListener:
+    # Session listener for the serve loop, where no UI needs to hear about changes
+    def __init__(self, server):
+        self.server = server
+
+    def entry_added(self, entry):
+        self.server.dirty = True
+
+    entry_removed = entry_changed = entry_added
+
+    def entries_cleared(self):
+        self.server.dirty = True
+
+
+def required(args, key):
+    try:
+        return args[key]
+    except KeyError:
+        raise ValueError(f"Missing {key!r}") from None
+
+
+def find_entry(session, name):
+    for entry in session.entries.values():
+        if entry.name == name:
+            return entry
+    raise LookupError(f"No entry named {name!r}")
+
+
+def required_name(args, key="name"):
+    name = required(args, key)
+    if not isinstance(name, str) or not name:
+        raise ValueError(f"{key!r} must be a non-empty string")
+    return name
+
+
+def required_names(args):
+    names = required(args, "names")
+    if not isinstance(names, list) or not names or not all(isinstance(name, str) and name for name in names):
+        raise ValueError("'names' must be a non-empty list of non-empty strings")
+    return names
+
+
+def parse_seconds(args):
+    if "seconds" in args:
+        seconds = args["seconds"]
+        if not isinstance(seconds, int) or isinstance(seconds, bool):
+            raise ValueError("'seconds' must be an integer")
+        return seconds
+    text = required(args, "time")
+    if not isinstance(text, str):
+        raise ValueError("'time' must be a string, HH:MM:SS")
+    return parse_duration(text)
+
+
+def check_request(method, headers):
+    # (status, payload) refusing the request, or None
+    if "origin" in headers:
+        return 403, {"error": "Cross-origin requests are not allowed"}
+    host, _, port = headers.get("host", "").partition(":")
+    if host not in ALLOWED_HOSTS or (port and not port.isdigit()):
+        return 403, {"error": f"Host {headers.get('host', '')!r} is not allowed"}
+    if method == "POST" and headers.get("content-type", "").split(";")[0].strip().lower() != "application/json":
+        return 415, {"error": "POST bodies must be application/json"}
+    return None
+
+
+def execute(session, command, args):
+    # Runs on the owner's thread; the same Session calls the app's buttons make
+    if command == "start":
+        name = required_name(args)
+        try:
+            entry = find_entry(session, name)
+        except LookupError:
+            entry = session.add_entry(name)
+        session.start(entry)
+    elif command == "stop":
+        entry = find_entry(session, required_name(args)) if args.get("name") is not None else session.active_entry
+        if entry is None or not entry.running:
+            raise LookupError("No running entry")
+        session.stop(entry)
+    elif command in ("add-time", "remove-time"):
+        entry = find_entry(session, required_name(args))
+        seconds = parse_seconds(args)
+        if command == "add-time":
+            session.add_time(entry, seconds)
+        else:
+            session.add_time(entry, -seconds, action="Remove Time")
+    elif command == "combine":
+        entries = [find_entry(session, name) for name in required_names(args)]
+        selected = [entry for entry in session.entries.values() if entry.selected]
+        for entry in selected:
+            entry.selected = False  # Combine the named entries only, whatever is selected in the app
+        for entry in entries:
+            entry.selected = True
+        try:
+            entry = session.combine_selected_entries()
+        finally:
+            for other in selected:
+                other.selected = True
+    else:
+        raise LookupError(f"Unknown command {command}")
+    return {"name": entry.name, "seconds": int(entry.current_elapsed()), "running": entry.running}
+
+
+def history(folder, db_path, start_date, end_date):
+    # Per-entry totals over the folder, from the SQLite entries table when the app uses it
+    if db_path:
+        from storage import connect, entry_totals
+        connection = connect(db_path)
+        try:
+            totals = entry_totals(connection, start_date, end_date)
+        finally:
+            connection.close()
+    else:
+        from report import Report, fold_log, find_daily_logs
+        report = Report()
+        for _, path in find_daily_logs(folder, start_date, end_date):
+            report.merge(fold_log(path))
+        totals = report.by_entry
+    return [{"name": name, "entry_date": entry_date, "seconds": seconds, "elapsed": format_duration(seconds)}
+            for (name, entry_date), seconds in sorted(totals.items(), key=lambda item: (item[0][1], item[0][0]))]
+
+
+class ApiServer:
+    def __init__(self, folder, db_path=None, host=HOST, port=DEFAULT_PORT):
+        self.folder = folder
+        self.db_path = db_path
+        self.host = host
+        self.port = port
+        self.snapshot = None  # Replaced, never modified, by publish()
+        self.dirty = True
+        self.commands = queue.Queue()  # (command, args, concurrent.futures.Future) for the owner
+        self.loop = None
+        self.server = None
+        self.thread = None
+
+    # Owner side
+
+    def publish(self, session):
+        self.snapshot = Snapshot(session)
+        self.dirty = False
+
+    def drain(self, session, batch=nullcontext):
+        # Apply the queued mutations; returns True when some were applied
+        applied = False
+        while True:
+            try:
+                command, args, future = self.commands.get_nowait()
+            except queue.Empty:
+                break
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                with batch():
+                    result = execute(session, command, args)
+                future.set_result(result)
+            except Exception as e:
+                future.set_exception(e)
+            applied = True
+        if applied or self.dirty:
+            self.publish(session)
+        return applied
+
+    def start_thread(self):
+        # Serve from a daemon thread with its own event loop, e.g. next to the Tk mainloop.
+        # Raises OSError when the socket cannot be bound, e.g. the port is in use.
+        started = threading.Event()
+        errors = []
+
+        def run():
+            loop = asyncio.new_event_loop()
+            try:
+                loop.run_until_complete(self.start())
+            except Exception as e:
+                errors.append(e)
+                loop.close()
+                return
+            finally:
+                started.set()
+            self.loop = loop
+            loop.run_forever()
+
+        self.thread = threading.Thread(target=run, name="api server", daemon=True)
+        self.thread.start()
+        if not started.wait(START_TIMEOUT):
+            raise TimeoutError(f"The API server did not start within {START_TIMEOUT} s")
+        if errors:
+            raise errors[0]
+
+    def stop_thread(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.server.close)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+    # Server side
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        print(f"API server listening on http://{self.host}:{self.port}")
+
+    async def handle(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                key, _, value = line.decode("latin-1").partition(":")
+                headers[key.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length") or 0))
+            rejected = check_request(method, headers)
+            if rejected:
+                status, payload = rejected
+            else:
+                with instrumentation.span("server.request"):
+                    status, payload = await self.route(method, target, body)
+        except (ValueError, asyncio.IncompleteReadError) as e:
+            status, payload = 400, {"error": str(e)}
+        except Exception as e:
+            print(f"API server error: {e!r}")
+            status, payload = 500, {"error": str(e)}
+        data = json.dumps(payload).encode()
+        writer.write(f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode("latin-1") + data)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def route(self, method, target, body):
+        url = urlsplit(target)
+        path = url.path.rstrip("/")
+        if method == "GET":
+            snapshot = self.snapshot
+            if snapshot is None:
+                return 503, {"error": "No state published yet"}
+            now = time.time()
+            if path == "/entries":
+                total = snapshot.total(now)
+                return 200, {"entries": list(snapshot.entry_dicts(now)), "running": snapshot.active_id,
+                             "total_seconds": int(total), "total": format_duration(total)}
+            if path == "/total":
+                total = snapshot.total(now)
+                return 200, {"total_seconds": int(total), "total": format_duration(total)}
+            if path == "/history":
+                query = parse_qs(url.query)
+                start_date = query.get("start", [None])[0]
+                end_date = query.get("end", [None])[0]
+                # Folds log files, off the event loop so that reads keep being served
+                entries = await asyncio.get_running_loop().run_in_executor(
+                    None, history, self.folder, self.db_path, start_date, end_date)
+                return 200, {"entries": entries}
+            return 404, {"error": f"Unknown path {path}"}
+        if method == "POST":
+            command = path.lstrip("/")
+            args = json.loads(body or b"{}")
+            if not isinstance(args, dict):
+                raise ValueError("Expected a JSON object")
+            future = concurrent.futures.Future()
+            self.commands.put((command, args, future))
+            try:
+                result = await asyncio.wait_for(asyncio.wrap_future(future), MUTATION_TIMEOUT)
+            except asyncio.TimeoutError:
+                return 503, {"error": "The tracker did not apply the change in time"}
+            except LookupError as e:
+                return 404, {"error": str(e)}
+            except (ValueError, TypeError) as e:
+                return 400, {"error": str(e)}
+            return 200, result
+        return 405, {"error": f"Method {method} not allowed"}
+
+
+def serve(folder, log=None, port=DEFAULT_PORT):
+    # Headless mode: the serve loop owns the Session and is the only writer of the log. Like the app, it
+    # journals the running timer and resolves the timers the log left running with journal.recover_running.
+    from journal import Journal, recover_running
+    from storage import open_storage
+    storage = open_storage(folder)
+    log = log or time.strftime("%Y-%m-%d") + " - time tracking.csv"
+    if not storage.open_log(log):
+        return
+    server = ApiServer(folder, getattr(storage, "db_path", None), port=port)
+    session = Session(listener=DirtyListener(server))
+    session.load_entries(storage.load(), new_entry_for_every_line=True)
+    engine = getattr(storage, "replay_engine", None)
+    try:
+        journal = Journal(storage.journal_path())
+    except (OSError, ValueError) as e:
+        print(f"Cannot open the journal of {log}: {e}")
+        journal = None
+    state = journal.read() if journal else None
+    recovered = recover_running(session, engine.running if engine else {}, state, log)
+    session.log = lambda action, entry, comment="": storage.log(log_row(action, entry, comment))
+    if recovered:
+        entry, comment = recovered
+        storage.log(log_row("Stop", entry, comment, now=state.heartbeat))
+    server.publish(session)
+
+    async def main_loop():
+        await server.start()
+        last_heartbeat = 0.0
+        while True:
+            server.drain(session, storage.batch)
+            storage.poll()
+            if journal:
+                journal.record(session.active_entry, log)  # Writes only when the running timer changed
+                if time.monotonic() - last_heartbeat >= 1.0:
+                    journal.heartbeat()
+                    last_heartbeat = time.monotonic()
+            await asyncio.sleep(POLL_MS / 1000)
+
+    try:
+        asyncio.run(main_loop())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        active = session.active_entry
+        if active is not None and active.running and journal:  # Else another live instance may run it
+            with storage.batch():
+                session.stop(active)  # Keep the time up to now, as the app does when it is closed
+        if journal:
+            journal.clear()
+            journal.close()
+        storage.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the tracker state as local HTTP/JSON, without the window.")
+    parser.add_argument("--folder", default=os.getcwd())
+    parser.add_argument("--log", help="log file name, defaults to today's log")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args(argv)
+    serve(args.folder, args.log, args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import argparse
+import csv
+import heapq
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from replay import CSV_HEADERS, ReplayEngine
+
+# Several app instances may share one working folder (e.g. on a network share). Appends to a log are
+# always serialized through an advisory lock, and with TIMETRACKING_SHARED=1 every instance also
+# tails the rows the others append. Readers need no lock: the replay only consumes complete lines and
+# a locked append never interleaves with another one.
+SHARED_ENV_VAR = "TIMETRACKING_SHARED"
+LOCK_SUFFIX = ".lock"
+TAIL_INTERVAL = 2.0  # Seconds between two looks for rows appended by other instances
+
+
+def shared_mode_enabled():
+    return os.environ.get(SHARED_ENV_VAR, "") not in ("", "0")
+
+
+class FileLock:
+    # Advisory lock on "<log>.lock". A separate file, so that the lock outlives the log itself being
+    # replaced (compaction writes a new file and renames it over the old one).
+    def __init__(self, path):
+        self.path = path + LOCK_SUFFIX
+        self.lock_file = None
+        self.depth = 0  # Re-entrant within one instance
+
+    def acquire(self, blocking=True):
+        # Returns False, without waiting, when not blocking and another process holds the lock
+        if self.depth:
+            self.depth += 1
+            return True
+        if self.lock_file is None:
+            self.lock_file = open(self.path, "a+")
+        if fcntl:
+            # lockf (fcntl locks) rather than flock, it also works over NFS
+            try:
+                fcntl.lockf(self.lock_file.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                if blocking:
+                    raise
+                return False
+        else:
+            self.lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self.lock_file.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    if not blocking:
+                        return False
+                    # LK_LOCK gives up after 10 seconds, keep waiting
+        self.depth = 1
+        return True
+
+    def release(self):
+        self.depth -= 1
+        if self.depth:
+            return
+        if fcntl:
+            fcntl.lockf(self.lock_file.fileno(), fcntl.LOCK_UN)
+        else:
+            self.lock_file.seek(0)
+            msvcrt.locking(self.lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def close(self):
+        if self.lock_file is not None:
+            self.lock_file.close()
+            self.lock_file = None
+            self.depth = 0
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+        return False
+
+
+def read_rows(path):
+    # Data rows of one log, in file order
+    return (row for row in ReplayEngine(path).read_new_rows() if row)
+
+
+def merge_rows(paths):
+    # Rows of several logs (e.g. one per person) merged into one stream ordered by timestamp.
+    # Each log is already in timestamp order, so this streams with one row per log in memory;
+    # rows with the same timestamp keep the order of `paths`.
+    return heapq.merge(*(read_rows(path) for path in paths), key=lambda row: row[0])
+
+
+def merge_logs(paths, output):
+    with open(output, "w", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(CSV_HEADERS)
+        count = 0
+        for row in merge_rows(paths):
+            writer.writerow(row)
+            count += 1
+    print(f"Merged {count} row(s) from {len(paths)} log(s) into {output}")
+    return output
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge several time tracking logs into one, by timestamp.")
+    parser.add_argument("output", help="path of the merged CSV")
+    parser.add_argument("logs", nargs="+", help="logs to merge")
+    args = parser.parse_args(argv)
+    merge_logs(args.logs, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,411 @@
+import argparse
+import csv
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+import binlog
+import instrumentation
+from compact import compact_log
+from folder_index import FolderIndex
+from journal import journal_path
+from log_writer import LogWriter, durability_from_env
+from replay import CSV_HEADERS, ReplayEngine
+from report import Report, report_file_name, save_report
+from shared_log import TAIL_INTERVAL, FileLock, shared_mode_enabled
+from timecodec import parse_date, parse_duration
+
+STORAGE_ENV_VAR = "TIMETRACKING_STORAGE"  # "csv" (default) or "sqlite"
+SQLITE_FILE_NAME = "time tracking.sqlite3"
+
+
+def open_storage(folder, kind=None):
+    kind = kind or os.environ.get(STORAGE_ENV_VAR) or "csv"
+    if kind == "sqlite":
+        return SqliteStorage(os.path.join(folder, SQLITE_FILE_NAME))
+    if kind != "csv":
+        print(f"Unknown storage {kind}, using csv")
+    return CsvStorage(folder)
+
+
+class CsvStorage:
+    # One append-only CSV file per log in the working folder
+    def __init__(self, folder, durability=None):
+        self.folder = folder
+        self.durability = durability or durability_from_env()  # When buffered log rows are written out
+        self.log_name = None  # Name of the open log
+        self.csv_file = None  # CSV file handle
+        self.csv_writer = None  # Buffered LogWriter for the CSV file
+        self.csv_path = None  # Path of the open CSV file
+        self.replay_engine = None  # Folds the open CSV file into the latest entry states
+        self.index = FolderIndex(folder)  # Cached listing of the folder's CSV files
+        self.shared = shared_mode_enabled()  # Other instances append to the same logs
+        self.last_tail = 0.0
+
+    def list_logs(self):
+        return self.index.names()
+
+    def poll_logs(self):
+        # True when logs were added to or removed from the folder since the last call
+        return self.index.poll()
+
+    def create_log(self, file_name):
+        file_path = os.path.join(self.folder, file_name)
+        try:
+            with open(file_path, 'x', newline='') as csv_file:  # Never truncate a log another instance created
+                writer = csv.writer(csv_file)
+                writer.writerow(CSV_HEADERS)
+        except FileExistsError:
+            pass
+        self.index.refresh(file_name)
+
+    def is_open(self):
+        return self.csv_writer is not None and not self.csv_writer.closed
+
+    def open_log(self, file_name):
+        if self.log_name == file_name and self.is_open():
+            print(f"CSV file {file_name} is already open.")
+            return True
+
+        if self.log_name != file_name:
+            self.close_log()
+
+        # A file missing from the index may have been created since the last poll, check it before
+        # creating it (again) with a header row
+        exists = file_name.endswith("- time tracking.csv") and (
+            file_name in self.index or self.index.refresh(file_name) is not None)
+        expected_headers = CSV_HEADERS
+        open_path = os.path.join(self.folder, file_name)
+        if exists:
+            self.csv_file = open(open_path, "a+", newline='')
+            reader = csv.reader(self.csv_file)
+            self.csv_file.seek(0)
+
+            headers = next(reader, None)
+            if headers != expected_headers:
+                self.csv_file.close()
+                print(f"Invalid headers in CSV file: {headers}\nExpected: {expected_headers}")
+                return False
+            print(f"Opened existing CSV file: {file_name}")
+        else:
+            self.csv_file = open(open_path, "a", newline='')
+            csv.writer(self.csv_file).writerow(expected_headers)
+            self.csv_file.flush()
+            self.index.refresh(file_name)
+            print(f"Created new CSV file: {file_name}")
+
+        mirror = None
+        if binlog.binary_log_enabled():
+            try:
+                mirror = binlog.open_sidecar(open_path)
+            except (OSError, ValueError) as e:
+                print(f"Cannot write binary log next to {open_path}: {e}")
+        # Appends are locked even when not shared, so that a compaction can safely replace the file
+        self.csv_writer = LogWriter(self.csv_file, *self.durability, mirror=mirror, lock=FileLock(open_path))
+        self.log_name = file_name
+        if self.csv_path != open_path or self.replay_engine is None:
+            self.csv_path = open_path
+            self.replay_engine = ReplayEngine(open_path)
+        return True
+
+    def close_log(self):
+        # The writer may have reopened the file (see LogWriter._follow_replaced_file)
+        if (self.csv_writer and not self.csv_writer.closed) or (self.csv_file and not self.csv_file.closed):
+            if self.csv_writer:
+                self.csv_writer.close()
+            else:
+                self.csv_file.close()
+            self.csv_file = None
+            self.csv_writer = None
+            print(f"Closed CSV file: {self.log_name}")
+
+    close = close_log
+
+    def log(self, row):
+        self.csv_writer.writerow(row)
+
+    def batch(self):
+        return self.csv_writer.batch()
+
+    def poll(self):
+        if self.is_open():
+            self.csv_writer.poll()
+
+    def flush(self):
+        if self.is_open():
+            self.csv_writer.flush()
+
+    def journal_path(self):
+        return journal_path(self.csv_path)
+
+    def poll_remote(self):
+        # In shared mode, (changed, removed) entry states appended by other instances since the last call
+        if not self.shared or not self.is_open():
+            return None
+        now = time.monotonic()
+        if now - self.last_tail < TAIL_INTERVAL:
+            return None
+        self.last_tail = now
+        return self.replay_engine.tail()
+
+    def load(self):
+        self.csv_writer.flush()  # The replay reads the file, not the write buffer
+        # Only the rows appended since the last replay (or checkpoint) are read
+        return self.replay_engine.replay()
+
+    def loader(self):
+        # Same as load(), split so that the returned callable can run on a worker thread
+        self.csv_writer.flush()
+        engine = self.replay_engine
+        return lambda should_stop: engine.replay(should_stop=should_stop)
+
+    def reporter(self, start_date=None, end_date=None):
+        # Returns a callable that saves the folder report and can run on a worker thread
+        self.flush()  # Include the rows of the open log
+        self.index.poll()
+        # The index is read here, it is not thread-safe
+        folder, logs = self.folder, self.index.daily_logs(start_date, end_date)
+        return lambda: save_report(folder, start_date, end_date, logs=logs)
+
+    def compact(self):
+        # Rewrite the open log as one row per live entry; the writer reopens it on its next flush
+        if not self.is_open():
+            return None
+        self.csv_writer.flush()
+        compacted = compact_log(self.csv_path, lock=self.csv_writer.lock)
+        self.index.refresh(self.log_name)
+        return compacted
+
+
+class SqliteStorage:
+    # All logs in one SQLite database: every logged row goes to `events`, and `entries` holds the
+    # folded state of each log, kept up to date on every write, so loading a log is a single query.
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.folder = os.path.dirname(db_path)
+        self.connection = connect(db_path)
+        self.log_name = None
+        self.batch_depth = 0
+
+    def list_logs(self):
+        return [name for (name,) in self.connection.execute("SELECT name FROM logs ORDER BY name")]
+
+    def poll_logs(self):
+        return False  # Logs are only created through this storage
+
+    def create_log(self, name):
+        with self.connection:
+            self.connection.execute("INSERT OR IGNORE INTO logs (name) VALUES (?)", (name,))
+
+    def is_open(self):
+        return self.log_name is not None
+
+    def open_log(self, name):
+        self.create_log(name)
+        self.log_name = name
+        return True
+
+    def close_log(self):
+        self.log_name = None
+
+    def close(self):
+        self.close_log()
+        self.connection.close()
+
+    def log(self, row):
+        insert_row(self.connection, self.log_name, row)
+        instrumentation.count("sqlite.rows_written")
+        if not self.batch_depth:
+            with instrumentation.span("sqlite.commit"):
+                self.connection.commit()
+
+    @contextmanager
+    def batch(self):
+        # Rows logged inside the block are committed in one transaction
+        self.batch_depth += 1
+        try:
+            yield self
+        finally:
+            self.batch_depth -= 1
+            if not self.batch_depth:
+                self.connection.commit()
+
+    def poll(self):
+        pass
+
+    def journal_path(self):
+        return journal_path(os.path.join(self.folder, self.log_name))
+
+    def poll_remote(self):
+        return None  # SQLite serializes concurrent writers itself, the entries table is always current
+
+    def flush(self):
+        if not self.batch_depth:
+            self.connection.commit()
+
+    @instrumentation.timed("sqlite.load")
+    def load(self):
+        return load_entries(self.connection, self.log_name)
+
+    def loader(self):
+        # SQLite connections belong to their thread, the worker opens its own (WAL allows concurrent readers)
+        self.flush()
+        db_path, log_name = self.db_path, self.log_name
+
+        def load(should_stop):
+            connection = sqlite3.connect(db_path)
+            try:
+                return load_entries(connection, log_name)
+            finally:
+                connection.close()
+        return load
+
+    def compact(self):
+        print("Nothing to compact: SQLite logs are loaded from the folded entries table.")
+        return None
+
+    def totals(self, start_date=None, end_date=None):
+        # (name, entry_date) -> seconds summed over every log, from the entries table
+        return entry_totals(self.connection, start_date, end_date)
+
+    def reporter(self, start_date=None, end_date=None):
+        # Same as loader(), the worker opens its own connection
+        self.flush()
+        db_path, folder = self.db_path, self.folder
+
+        def save():
+            connection = sqlite3.connect(db_path)
+            try:
+                totals = entry_totals(connection, start_date, end_date)
+            finally:
+                connection.close()
+            report = Report()
+            report.merge(totals)
+            output = os.path.join(folder, report_file_name(start_date, end_date))
+            report.write_csv(output)
+            print(f"Report saved to {output}")
+            return output
+        return save
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS logs (
+    name TEXT PRIMARY KEY,
+    source_offset INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    log TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    action TEXT NOT NULL,
+    name TEXT NOT NULL,
+    elapsed_time TEXT NOT NULL,
+    entry_date TEXT NOT NULL,
+    comment TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_entry_date_name ON events (entry_date, name);
+CREATE INDEX IF NOT EXISTS events_log ON events (log, id);
+CREATE TABLE IF NOT EXISTS entries (
+    log TEXT NOT NULL,
+    name TEXT NOT NULL,
+    elapsed_time TEXT NOT NULL,
+    entry_date TEXT NOT NULL,
+    first_event INTEGER NOT NULL,
+    PRIMARY KEY (log, name)
+);
+CREATE INDEX IF NOT EXISTS entries_entry_date_name ON entries (entry_date, name);
+"""
+
+
+def connect(db_path):
+    connection = sqlite3.connect(db_path)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def insert_row(connection, log_name, row):
+    # Append one CSV-shaped row and fold it into the entries table, same rules as ReplayEngine.apply
+    if len(row) != 6:
+        print(f"Skipping row with invalid data formatting: {row}")
+        return
+    timestamp, action, name, elapsed_time, entry_date, comment = row
+    event_id = connection.execute(
+        "INSERT INTO events (log, timestamp, action, name, elapsed_time, entry_date, comment) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)", (log_name, timestamp, action, name, elapsed_time, entry_date, comment)).lastrowid
+    if action == "Remove":
+        connection.execute("DELETE FROM entries WHERE log = ? AND name = ?", (log_name, name))
+        return
+    if action == "Rename":
+        old_name = comment.split("Renamed from ", 1)[1] if comment.startswith("Renamed from ") else ""
+        connection.execute("DELETE FROM entries WHERE log = ? AND name = ?", (log_name, old_name))
+        if not name:
+            return
+    elif name == '':
+        print(f"Skipping row with missing name: {row}")
+        return
+    connection.execute(
+        "INSERT INTO entries (log, name, elapsed_time, entry_date, first_event) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT (log, name) DO UPDATE SET elapsed_time = excluded.elapsed_time, entry_date = excluded.entry_date",
+        (log_name, name, elapsed_time, entry_date, event_id))
+
+
+def load_entries(connection, log_name):
+    rows = connection.execute("SELECT name, elapsed_time, entry_date FROM entries WHERE log = ? ORDER BY first_event",
+                              (log_name,))
+    return {name: (elapsed_time, entry_date) for name, elapsed_time, entry_date in rows}
+
+
+def entry_totals(connection, start_date=None, end_date=None):
+    totals = {}
+    rows = connection.execute("SELECT name, entry_date, elapsed_time FROM entries "
+                              "WHERE entry_date BETWEEN ? AND ?", (start_date or "", end_date or "9999"))
+    for name, entry_date, elapsed_time in rows:
+        try:
+            parse_date(entry_date)
+            seconds = parse_duration(elapsed_time)
+        except ValueError:
+            print(f"Skipping entry with invalid elapsed time or date: {name} {elapsed_time} {entry_date}")
+            continue
+        totals[(name, entry_date)] = totals.get((name, entry_date), 0) + seconds
+    return totals
+
+
+def import_csv_folder(folder, db_path=None):
+    # Import every "* - time tracking.csv" of the folder. Each log remembers how far it was imported,
+    # so running the import again only adds the rows appended since.
+    connection = connect(db_path or os.path.join(folder, SQLITE_FILE_NAME))
+    try:
+        for file_name in sorted(os.listdir(folder)):
+            if not file_name.endswith("- time tracking.csv"):
+                continue
+            engine = ReplayEngine(os.path.join(folder, file_name))
+            with connection:
+                connection.execute("INSERT OR IGNORE INTO logs (name) VALUES (?)", (file_name,))
+                (engine.offset,) = connection.execute("SELECT source_offset FROM logs WHERE name = ?",
+                                                      (file_name,)).fetchone()
+                if engine.offset > os.path.getsize(engine.file_path):
+                    print(f"{file_name} is shorter than what was imported, skipping it.")
+                    continue
+                imported = 0
+                for row in engine.read_new_rows():
+                    insert_row(connection, file_name, row)
+                    imported += 1
+                connection.execute("UPDATE logs SET source_offset = ? WHERE name = ?", (engine.offset, file_name))
+            print(f"Imported {imported} row(s) from {file_name}")
+    finally:
+        connection.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import the CSV logs of a folder into the SQLite storage.")
+    parser.add_argument("folder", nargs="?", default=os.getcwd())
+    parser.add_argument("--db", help=f"database path, defaults to \"{SQLITE_FILE_NAME}\" in the folder")
+    args = parser.parse_args(argv)
+    import_csv_folder(args.folder, args.db)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import csv
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TESTS_DIR))
+sys.path.insert(0, os.path.join(os.path.dirname(TESTS_DIR), "benchmarks"))
+
+import analytics
+import binlog
+import generate_logs
+import report
+import storage
+from replay import CSV_HEADERS, ReplayEngine
+from timecodec import parse_date, parse_duration
+
+# Every way of folding a log must agree on the entries it ends with: the full replay, a replay resumed
+# from its checkpoint, the binary sidecar, the SQLite entries table and the NumPy analytics.
+ROWS = 3000
+DATES = ("2026-01-05", "2026-01-06")
+
+
+def malformed_rows(entry_date):
+    timestamp = f"{entry_date} 23:00:00"
+    return [
+        [timestamp, "Start", "task 1"],  # Too few fields
+        [timestamp, "Start", "", "00:00:00", entry_date, ""],  # Missing name
+        ["yesterday", "Stop", "task 2", "00:10:00", entry_date, ""],  # Invalid timestamp, still folded
+        [timestamp, "Stop", "task 3", "ten minutes", entry_date, ""],  # Invalid elapsed time
+        [timestamp, "Stop", "task 4", "00:10:00", "2026-13-45", ""],  # Invalid entry date
+        [timestamp, "Rename", "task 5 again", "00:05:00", entry_date, "Renamed from nobody"],  # Unknown name
+        [timestamp, "Rename", "", "00:00:00", entry_date, "Renamed from task 6"],  # Renamed to nothing
+        [timestamp, "Remove", "task 7", "00:00:00", entry_date, ""],
+        [timestamp, "Add Time", "task 7", "00:15:00", entry_date, ""],  # Added again after its removal
+        [timestamp, "Remove", "task 8", "bad", "bad", ""],  # Removes whatever its other fields hold
+    ]
+
+
+def log_rows(entry_date, seed, malformed):
+    rows = list(generate_logs.generate_rows(ROWS, entries=20, renames=0.02, removes=0.02, entry_date=entry_date,
+                                            seed=seed))
+    if malformed:
+        rng = random.Random(seed)
+        extra = malformed_rows(entry_date)
+        for row in extra:  # Somewhere in the log, where later rows may fold over them, and at its end
+            rows.insert(rng.randrange(len(rows)), row)
+        rows.extend(extra)
+    return rows
+
+
+def write_rows(path, rows, mode="w"):
+    with open(path, mode, newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        if mode == "w":
+            writer.writerow(CSV_HEADERS)
+        writer.writerows(rows)
+
+
+def replay_totals(paths):
+    # (name, entry_date) -> seconds summed over the logs, straight from the replay; entries whose
+    # elapsed time or date cannot be parsed have no total
+    totals = {}
+    for path in paths:
+        for name, (elapsed_time, entry_date) in ReplayEngine(path).replay(use_checkpoint=False).items():
+            try:
+                seconds = parse_duration(elapsed_time)
+                parse_date(entry_date)
+            except ValueError:
+                continue
+            totals[(name, entry_date)] = totals.get((name, entry_date), 0) + seconds
+    return totals
+
+
+class FoldEquivalenceTest(unittest.TestCase):
+    malformed = True
+
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.folder = self.work_dir.name
+        self.rows = {}
+        self.paths = []
+        for seed, entry_date in enumerate(DATES):
+            path = os.path.join(self.folder, f"{entry_date} - time tracking.csv")
+            self.rows[path] = log_rows(entry_date, seed, self.malformed)
+            write_rows(path, self.rows[path])
+            self.paths.append(path)
+
+    def tearDown(self):
+        self.work_dir.cleanup()
+
+    def test_checkpointed_replay(self):
+        for path, rows in self.rows.items():
+            full = ReplayEngine(path)
+            full.replay(use_checkpoint=False)
+            resumed_path = path + ".resumed.csv"
+            half = len(rows) // 2
+            write_rows(resumed_path, rows[:half])
+            ReplayEngine(resumed_path).replay()
+            write_rows(resumed_path, rows[half:], mode="a")
+            resumed = ReplayEngine(resumed_path)
+            self.assertTrue(resumed.load_checkpoint())
+            self.assertGreater(resumed.offset, 0)
+            resumed.replay()
+            self.assertEqual(list(resumed.last_entries.items()), list(full.last_entries.items()))
+            self.assertEqual(resumed.running, full.running)
+
+    def test_sqlite_entries(self):
+        db_path = os.path.join(self.folder, storage.SQLITE_FILE_NAME)
+        storage.import_csv_folder(self.folder, db_path)
+        connection = sqlite3.connect(db_path)
+        try:
+            for path in self.paths:
+                expected = ReplayEngine(path).replay(use_checkpoint=False)
+                entries = storage.load_entries(connection, os.path.basename(path))
+                self.assertEqual(list(entries.items()), list(expected.items()))
+            self.assertEqual(storage.entry_totals(connection), replay_totals(self.paths))
+        finally:
+            connection.close()
+
+    def test_report(self):
+        self.assertEqual(dict(report.build_report(self.folder, jobs=1).by_entry), replay_totals(self.paths))
+
+    def test_binary_sidecar(self):
+        for path in self.paths:
+            binlog.csv_to_binary(path)
+            if self.malformed:
+                # Rows the sidecar cannot encode leave it stale, readers fall back to the CSV
+                self.assertFalse(binlog.is_up_to_date(path))
+                continue
+            self.assertTrue(binlog.is_up_to_date(path))
+            with binlog.BinaryLogReader(binlog.sidecar_path(path)) as reader:
+                self.assertEqual(reader.last_entries(), ReplayEngine(path).replay(use_checkpoint=False))
+        self.assertEqual(dict(report.build_report(self.folder, jobs=1).by_entry), replay_totals(self.paths))
+
+    @unittest.skipIf(analytics.np is None, "NumPy is not installed")
+    def test_analytics(self):
+        expected = replay_totals(self.paths)
+        by_day = {(name, entry_date): seconds for name, entry_date, seconds in
+                  analytics.by_day(analytics.load_folder(self.folder))}
+        self.assertEqual(by_day, expected)
+        for path in self.paths:
+            binlog.csv_to_binary(path)
+        by_day = {(name, entry_date): seconds for name, entry_date, seconds in
+                  analytics.by_day(analytics.load_folder(self.folder))}
+        self.assertEqual(by_day, expected)
+
+
+class CleanFoldEquivalenceTest(FoldEquivalenceTest):
+    # Logs without malformed rows, whose sidecars are up to date and read instead of the CSV
+    malformed = False
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,26 +1,36 @@
+import argparse
 import tkinter as tk
-import time
-import csv
 from datetime import datetime
 from tkinter import filedialog
 import os
 import traceback
+from collections import Counter
+from contextlib import nullcontext
+import instrumentation
+from entry_list import EntryListView
+from journal import Journal, recover_running
+from loader import LogLoader, run_in_thread
+from model import Session, log_row
+from server import POLL_MS as SERVER_POLL_MS, ApiServer, port_from_env
+from storage import open_storage
+from timecodec import format_duration, local_date, parse_duration
+
+TICK_MS = 1000  # Period of the UI timer
 
 class StopwatchApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Time Tracking")
-        self.entries = {}
-        self.active_entry = None
-        self.rename_map = {}
+        self.session = Session(log=self.log_to_csv, listener=self)  # Entry state, independent of the widgets
+        self.name_lengths = {}  # Entry ID -> length of its name, to resize only when the longest name changes
+        self.name_length_counts = Counter()
+        self.name_width = None
         self.working_folder = os.getcwd()  # Set default working folder to the script's directory
-
-        self.first_entry_date = None  # Track the first entry date
-        self.csv_filename = None  # Track the current CSV file name
-        self.csv_file = None  # CSV file handle
-        self.csv_writer = None  # CSV writer object
-        self.rename_map = {}  # Map entry IDs to base names
-        self.entry_counter = 0  # Counter to generate unique IDs
+        self.storage = open_storage(self.working_folder)  # CSV files or SQLite database holding the logs
+        self.loader = LogLoader(root)  # Loads logs off the Tk thread and adds their entries in batches
+        self.server = None  # Optional local HTTP/JSON API, see start_server()
+        self.journal = None  # Heartbeat of the running timer next to the open log
+        self.pending_recovery = None  # Journal state read when the log was opened, applied once it is loaded
 
         # Create a frame to hold the browse button and the dropdown
         self.browse_frame = tk.Frame(root)
@@ -41,6 +51,39 @@ class StopwatchApp:
         self.create_ui()
         self.update_csv_dropdown()  # Populate the dropdown with CSV files from the default folder
         self.update_window_size()
+        self.root.after(TICK_MS, self.tick)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def start_server(self, port):
+        # Serve the entries from a background thread; its mutations are applied here, on the Tk thread
+        server = ApiServer(self.working_folder, getattr(self.storage, "db_path", None), port=port)
+        server.publish(self.session)
+        try:
+            server.start_thread()
+        except OSError as e:
+            print(f"Cannot start the API server on port {port}: {e}")
+            return
+        self.server = server
+        self.root.after(SERVER_POLL_MS, self.poll_server)
+
+    def poll_server(self):
+        if self.server.drain(self.session, self.log_batch):
+            self.refresh_ui()
+        self.root.after(SERVER_POLL_MS, self.poll_server)
+
+    def on_close(self):
+        if self.server:
+            self.server.stop_thread()
+        self.loader.cancel()
+        active = self.session.active_entry
+        if active is not None and active.running and self.storage.is_open() and self.journal:
+            # Keep the time up to now, the timer cannot run on. Without the journal another live instance
+            # owns the log and may be the one running it.
+            with self.log_batch():
+                self.session.stop(active)
+        self.close_journal()
+        self.storage.close()  # Write out any buffered log rows
+        self.root.destroy()
 
     def create_ui(self):
         self.total_time_label = tk.Label(self.root, text="Total Elapsed Time: 00:00:00")
@@ -75,316 +118,317 @@ class StopwatchApp:
         self.save_simplified_button = tk.Button(self.root, text="Save Simplified CSV", command=self.save_simplified_csv)
         self.save_simplified_button.pack()
 
+        self.folder_report_button = tk.Button(self.root, text="Save Folder Report", command=self.save_folder_report)
+        self.folder_report_button.pack()
+
+        self.compact_button = tk.Button(self.root, text="Compact Log", command=self.compact_log)
+        self.compact_button.pack()
+
         self.new_entry_checkbox_var = tk.BooleanVar()
         self.new_entry_checkbox = tk.Checkbutton(self.root, text="Create new entry for every line", variable=self.new_entry_checkbox_var)
         self.new_entry_checkbox.pack()
 
-        # Create a canvas and a scrollbar for the entries
-        self.canvas = tk.Canvas(self.root)
-        self.scrollbar = tk.Scrollbar(self.root, orient="vertical", command=self.canvas.yview)
-        self.scrollable_frame = tk.Frame(self.canvas)
-
-        self.scrollable_frame.bind(
-            "<Configure>",
-            lambda e: self.canvas.configure(
-                scrollregion=self.canvas.bbox("all")
-            )
-        )
-
-        self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        self.canvas.configure(yscrollcommand=self.scrollbar.set)
-
-        self.canvas.pack(side="left", fill="both", expand=True)
-        self.scrollbar.pack(side="right", fill="y")
+        # Create a canvas and a scrollbar for the entries, only the visible rows get widgets
+        self.entry_list = EntryListView(self.root, self.session, lambda parent: StopwatchEntry(parent, self))
+        self.canvas = self.entry_list.canvas
+        self.scrollbar = self.entry_list.scrollbar
+        self.entry_list.pack()
 
+    @instrumentation.timed("refresh_ui")
     def refresh_ui(self):
         self.update_total_time()
-        self.update_window_size()
+        self.update_name_width()
+
+    def tick(self):
+        # Single UI timer: only the running entry's label and the total can change between ticks
+        entry = self.session.active_entry
+        if entry is not None and entry.running:
+            row = self.entry_list.row_for(entry.id)
+            if row:
+                row.update_time()
+            self.update_total_time()
+            if self.journal:
+                self.journal.heartbeat()
+        self.storage.poll()
+        remote = self.storage.poll_remote()
+        if remote and (remote[0] or remote[1]):
+            self.session.sync_entries(*remote)  # Rows appended by other instances sharing the log
+            self.refresh_ui()
+        if self.storage.poll_logs():
+            self.rebuild_csv_menu(self.storage.list_logs())  # Logs added or removed by other tools
+        self.root.after(TICK_MS, self.tick)
 
     def add_time_to_selected(self):
         time_str = self.global_time_entry.get()
         if time_str:
-            for entry in self.entries.values():
-                if entry.selected.get():
-                    entry.elapsed_time += entry.time_to_seconds(time_str)
-                    entry.label.config(text=time.strftime("%H:%M:%S", time.gmtime(entry.elapsed_time)))
-                    self.log_to_csv("Add Time", entry)
+            with self.log_batch():
+                self.session.add_time_to_selected(parse_duration(time_str))
             self.refresh_ui()
 
     def remove_time_from_selected(self):
         time_str = self.global_time_entry.get()
         if time_str:
-            for entry in self.entries.values():
-                if entry.selected.get():
-                    entry.elapsed_time -= entry.time_to_seconds(time_str)
-                    entry.label.config(text=time.strftime("%H:%M:%S", time.gmtime(entry.elapsed_time)))
-                    self.log_to_csv("Remove Time", entry)
+            with self.log_batch():
+                self.session.remove_time_from_selected(parse_duration(time_str))
             self.refresh_ui()
 
     def scroll_time_entry(self, event):
         current_time = self.global_time_entry.get()
         if not current_time:
             current_time = "00:00:00"
-        h, m, s = map(int, current_time.split(":"))
         increment = 5 * 60  # 5 minutes in seconds
-        total_seconds = h * 3600 + m * 60 + s
+        total_seconds = parse_duration(current_time)
 
         if event.delta > 0:
             total_seconds += increment
         else:
             total_seconds -= increment
 
-        h, remainder = divmod(total_seconds, 3600)
-        m, s = divmod(remainder, 60)
-        new_time = f"{h:02}:{m:02}:{s:02}"
+        new_time = format_duration(total_seconds)
         self.global_time_entry.delete(0, tk.END)
         self.global_time_entry.insert(0, new_time)
 
     def combine_selected_entries(self):
-        selected_entries = [entry for entry in self.entries.values() if entry.selected.get()]
-        if not selected_entries:
-            return
-
-        combined_name = selected_entries[0].name_var.get()
-        total_elapsed_time = sum(entry.elapsed_time for entry in selected_entries)
-
-        for entry in selected_entries:
-            self.log_to_csv("Remove", entry, comment=f"Merged into {combined_name}")
-            self.remove_entry(entry.id)
-
-        combined_time_str = time.strftime("%H:%M:%S", time.gmtime(total_elapsed_time))
-        new_entry = self.add_entry(name=combined_name, elapsed_time=combined_time_str)
-
-        self.log_to_csv("Combine", new_entry, comment="Combined entry")
+        with self.log_batch():
+            new_entry = self.session.combine_selected_entries()
+        if new_entry:
+            self.refresh_ui()
 
     def update_total_time(self):
-        total_seconds = 0
-        for entry_t in self.entries.values():
-            total_seconds += entry_t.elapsed_time
-        formatted_time = time.strftime("%H:%M:%S", time.gmtime(total_seconds))
-        self.total_time_label.config(text=f"Total Elapsed Time: {formatted_time}")
+        text = f"Total Elapsed Time: {format_duration(self.session.total_time())}"
+        if text != self.total_time_label.cget("text"):
+            self.total_time_label.config(text=text)
 
     def browse_folder(self):
+        self.loader.cancel()
+        self.close_journal()
         self.close_csv()
         folder_selected = filedialog.askdirectory()
         if folder_selected:
+            self.storage.close()
             self.working_folder = folder_selected
+            self.storage = open_storage(self.working_folder)
             self.working_folder_var.set(self.working_folder)  # Update the text box
             self.update_csv_dropdown()
 
     def update_csv_dropdown(self):
-        csv_files = [f for f in os.listdir(self.working_folder) if f.endswith('.csv')]
-        menu = self.csv_dropdown['menu']
-        menu.delete(0, 'end')
-        today_date = datetime.today().strftime('%Y-%m-%d')
+        csv_files = self.storage.list_logs()
+        today_date = local_date()
         default_csv = f"{today_date} - time tracking.csv"
         if default_csv not in csv_files:
-            self.create_csv_file(default_csv)
+            self.storage.create_log(default_csv)
             csv_files.append(default_csv)
+        self.rebuild_csv_menu(csv_files)
+        self.csv_var.set(default_csv)
+
+    def rebuild_csv_menu(self, csv_files):
+        menu = self.csv_dropdown['menu']
+        menu.delete(0, 'end')
         for csv_file in csv_files:
             menu.add_command(label=csv_file, command=lambda value=csv_file: self.csv_var.set(value))
-        self.csv_var.set(default_csv)
 
     def on_csv_dropdown_change(self, *args):
         selected_csv = self.csv_var.get()
         print(f"CSV dropdown changed to: {selected_csv}")
         self.load_csv(selected_csv)
 
-    def create_csv_file(self, file_name):
-        file_path = os.path.join(self.working_folder, file_name)
-        with open(file_path, 'w', newline='') as csv_file:
-            writer = csv.writer(csv_file)
-            writer.writerow(["Timestamp", "Action", "Name", "Elapsed Time", "Entry Date", "Comment"])
-
     def open_csv(self, file_name):
-        if self.csv_filename == file_name and self.csv_file and not self.csv_file.closed and self.csv_writer:
-            print(f"CSV file {file_name} is already open.")
-            return
-
-        if self.csv_filename != file_name and self.csv_file and not self.csv_file.closed:
-            self.csv_file.close()
-            self.csv_file = None
-            self.csv_writer = None
-            print(f"Closed CSV file: {self.csv_filename}")
-
-        available_files = [f for f in os.listdir(self.working_folder) if f.endswith("- time tracking.csv")]
-        expected_headers = ["Timestamp", "Action", "Name", "Elapsed Time", "Entry Date", "Comment"]
-        if file_name in available_files:
-            open_path = os.path.join(self.working_folder, file_name)
-            self.csv_file = open(open_path, "a+", newline='')
-            reader = csv.reader(self.csv_file)
-            self.csv_file.seek(0)
-
-            headers = next(reader, None)
-            if headers != expected_headers:
-                rows = list(reader)
-                self.csv_file.close()
-                print(f"Invalid headers in CSV file: {headers}\nExpected: {expected_headers}")
-                return
-            print(f"Opened existing CSV file: {file_name}")
-        else:
-            self.csv_file = open(file_name, "a", newline='')
-            csv.writer(self.csv_file).writerow(expected_headers)
-            print(f"Created new CSV file: {file_name}")
-
-        self.csv_writer = csv.writer(self.csv_file)
-        self.csv_filename = file_name
+        return self.storage.open_log(file_name)
 
     def close_csv(self):
-        if self.csv_file and not self.csv_file.closed:
-            self.csv_file.close()
-            self.csv_file = None
-            self.csv_writer = None
-            print(f"Closed CSV file: {self.csv_filename}")
-
-    def log_to_csv(self, action, entry, comment=""):
-        if self.csv_writer:
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            self.csv_writer.writerow([timestamp, action, entry.name_var.get(),
-                                      time.strftime("%H:%M:%S", time.gmtime(entry.elapsed_time)),
-                                      entry.entry_date, comment])
-            self.csv_file.flush()
+        self.storage.close_log()
+
+    def log_to_csv(self, action, entry, comment="", now=None):
+        if self.storage.is_open():
+            self.storage.log(log_row(action, entry, comment, now))
         else:
             print(f"CSV file is not open. Cannot log action: {action}")
 
+    def log_batch(self):
+        # Log rows written inside the block are committed as one batch
+        return self.storage.batch() if self.storage.is_open() else nullcontext()
+
     def load_from_csv(self):
         file_path = filedialog.askopenfilename(filetypes=[("CSV files", "*.csv")])
         if file_path:
             self.load_csv(file_path)
 
+    @instrumentation.timed("load_csv")
     def load_csv(self, file_path):
         selected_csv = self.csv_var.get()
         if selected_csv:
-            self.open_csv(selected_csv)
-            if not self.csv_writer:
+            self.loader.cancel()  # Entries of the previously selected log are no longer wanted
+            if not self.open_csv(selected_csv):
                 print("Cannot log due to failure to open CSV file.")
                 return
 
+            self.open_journal()
             print(f"Loading CSV file: {file_path}")
-            if not self.new_entry_checkbox_var.get():
+            new_entry_for_every_line = self.new_entry_checkbox_var.get()
+            if not new_entry_for_every_line:
                 self.clear_entries()  # Clear current entries
+            existing_entries = self.session.existing_entries()
+
+            def add_batch(items):
+                with instrumentation.span("load_csv.batch"):
+                    self.session.load_entries(dict(items), new_entry_for_every_line, existing_entries)
+                    self.refresh_ui()
 
-            existing_entries = {(entry.name_var.get(), entry.entry_date) for entry in self.entries.values()}
             try:
-                #Set cursor to the beginning of the file
-                self.csv_file.seek(0)
-                reader = csv.reader(self.csv_file)
-                header = next(reader, None)  # Read header row
-                if header is None:
-                    print("CSV file is empty.")
-                    return
-                last_entries = {}
-                for row in reader:
-                    if len(row) == 6:
-                        action, name, elapsed_time, entry_date, comment = row[1], row[2], row[3], row[4], row[5]
-                        if action == "Remove":
-                            if name in last_entries:
-                                del last_entries[name]
-                        elif action == "Rename":
-                            #TODO revoir le rename
-                            new_name, old_name = name, comment.split("Renamed from ")[1]
-                            if old_name in last_entries:
-                                del last_entries[old_name]
-                                last_entries[new_name] = (elapsed_time, entry_date)
-                        elif name == '':
-                            print(f"Skipping row with missing name: {row}")
-                        else:
-                            last_entries[name] = (elapsed_time, entry_date)
-                    else:
-                        print(f"Skipping row with invalid data formatting: {row}")
-
-                for name, (elapsed_time, entry_date) in last_entries.items():
-                    if ((name, entry_date) not in existing_entries) or self.new_entry_checkbox_var.get():
-                        self.add_entry(name, elapsed_time, entry_date)
-                self.refresh_ui()
-                print("CSV file loaded and UI updated.")
+                self.loader.start(self.storage.loader(), add_batch, on_done=self.load_done)
             except Exception as e:
                 print(f"Failed to load CSV file: {e}")
                 traceback.print_exc()
 
+    def load_done(self):
+        print("CSV file loaded and UI updated.")
+        self.recover_running()
+
+    def open_journal(self):
+        self.close_journal()
+        try:
+            self.journal = Journal(self.storage.journal_path())
+        except (OSError, ValueError) as e:
+            print(f"Cannot open the journal of {self.storage.log_name}: {e}")
+            return
+        self.pending_recovery = self.journal.read()
+
+    def close_journal(self):
+        if self.journal:
+            if self.pending_recovery is None:
+                self.journal.clear()  # A clean close; a state still to recover is kept for the next start
+            self.journal.close()
+            self.journal = None
+        self.pending_recovery = None
+
+    def recover_running(self):
+        # Same rule as the command line and the serve loop, see journal.recover_running
+        state, self.pending_recovery = self.pending_recovery, None
+        engine = getattr(self.storage, "replay_engine", None)
+        recovered = recover_running(self.session, engine.running if engine else {}, state, self.storage.log_name)
+        if recovered:
+            entry, comment = recovered
+            self.log_to_csv("Stop", entry, comment, now=state.heartbeat)
+            print(f"Recovered {format_duration(entry.elapsed_time)} of {entry.name}: {comment}")
+        self.refresh_ui()
+        self.record_journal()
+
+    def record_journal(self):
+        if self.journal and self.pending_recovery is None:
+            self.journal.record(self.session.active_entry, self.storage.log_name)
+
     def save_simplified_csv(self):
         timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
         simplified_file_name = f"{timestamp} simplified - time tracking.csv"
         simplified_file_path = os.path.join(self.working_folder, simplified_file_name)
-        with open(simplified_file_path, 'w', newline='') as csv_file:
-            writer = csv.writer(csv_file)
-            writer.writerow(["Timestamp", "Action", "Name", "Elapsed Time", "Entry Date", "Comment"])
-            for entry in self.entries.values():
-                writer.writerow([datetime.now().strftime('%Y-%m-%d %H:%M:%S'), "Latest Status", entry.name_var.get(),
-                                 time.strftime("%H:%M:%S", time.gmtime(entry.elapsed_time)), entry.entry_date, ""])
+        self.session.write_simplified_csv(simplified_file_path)
         print(f"Simplified CSV saved to {simplified_file_path}")
 
+    def save_folder_report(self):
+        # Folding every log of the folder can take a while, keep the UI responsive meanwhile
+        try:
+            save = self.storage.reporter()
+        except Exception as e:
+            print(f"Failed to save folder report: {e}")
+            traceback.print_exc()
+            return
+        self.folder_report_button.config(state=tk.DISABLED)
+        run_in_thread(self.root, save, on_done=self.report_done)
+
+    def report_done(self, ok, result):
+        self.folder_report_button.config(state=tk.NORMAL)
+        if not ok:
+            print(f"Failed to save folder report: {result}")
+
+    def compact_log(self):
+        try:
+            self.storage.compact()
+        except Exception as e:
+            print(f"Failed to compact log: {e}")
+            traceback.print_exc()
+
     def add_entry(self, name="", elapsed_time="00:00:00", entry_date=None):
-        if not self.first_entry_date:
-            self.first_entry_date = datetime.today().strftime('%Y-%m-%d')
-        entry_id = self.entry_counter
-        self.entry_counter += 1
-        entry = StopwatchEntry(self.scrollable_frame, self, entry_id)
-        entry.set_values(name, elapsed_time, entry_date or self.first_entry_date)
-        self.entries[entry_id] = entry  # Store the entry by its ID
-        self.rename_map[entry_id] = name  # Add the entry ID to the rename_map
+        entry = self.session.add_entry(name, elapsed_time, entry_date)
         self.refresh_ui()
         return entry  # Return the newly created entry
 
     def remove_entry(self, entry_id):
-        entry = self.entries.pop(entry_id, None)
-        if entry:
-            if self.active_entry == entry:
-                self.active_entry = None
-            entry.frame.destroy()
-            self.log_to_csv("Remove", entry)
+        if self.session.remove_entry(entry_id):
             self.refresh_ui()
 
     def clear_entries(self):
-        for entry in self.entries.values():
-            entry.frame.destroy()
-        self.entries.clear()
+        self.session.clear_entries()
         self.refresh_ui()
 
+    # Session listener: keep the visible rows in sync with the entry state
+    def entry_added(self, entry):
+        self.entry_list.entry_added(entry)
+        self.track_name_length(entry)
+        self.state_changed()
+
+    def entry_removed(self, entry):
+        self.entry_list.entry_removed(entry)
+        self.state_changed()
+        length = self.name_lengths.pop(entry.id, None)
+        if length is not None:
+            self.name_length_counts[length] -= 1
+
+    def entries_cleared(self):
+        self.entry_list.entries_cleared()
+        self.name_lengths.clear()
+        self.name_length_counts.clear()
+        self.state_changed()
+
+    def entry_changed(self, entry):
+        row = self.entry_list.row_for(entry.id)
+        if row:
+            row.refresh()
+        self.track_name_length(entry)
+        self.state_changed()
+
+    def state_changed(self):
+        if self.server:
+            self.server.dirty = True  # The API snapshot is rebuilt on the next poll
+        self.record_journal()
+
+    def track_name_length(self, entry):
+        length = len(entry.name)
+        old_length = self.name_lengths.get(entry.id)
+        if old_length != length:
+            if old_length is not None:
+                self.name_length_counts[old_length] -= 1
+            self.name_length_counts[length] += 1
+            self.name_lengths[entry.id] = length
+
+    def update_name_width(self):
+        name_length = max((length for length, count in self.name_length_counts.items() if count > 0), default=0)
+        if name_length != self.name_width:
+            self.name_width = name_length
+            self.update_window_size()
+
+    @instrumentation.timed("update_window_size")
     def update_window_size(self):
-        name_length = 0
-        if len(self.entries) != 0:
-            self.root.update_idletasks()  # Ensure all widgets are updated
-            for entry in self.entries.values():
-                name_length = max(name_length, len(entry.name_var.get()))
-            for entry in self.entries.values():
-                entry.name_entry.config(width=name_length + 2)  # Add some padding
+        if len(self.session.entries) != 0:
+            self.entry_list.set_name_width((self.name_width or 0) + 2)  # Add some padding
         self.root.update_idletasks()
         self.root.geometry(f"{self.root.winfo_reqwidth()}x{self.root.winfo_reqheight()}")
 
-    def set_active_entry(self, entry):
-        if self.active_entry and self.active_entry != entry:
-            self.active_entry.stop()
-        self.active_entry = entry
-        entry.frame.config(bg="lightgreen")
-
-    def set_inactive_entry(self, entry):
-        if self.active_entry == entry:
-            self.active_entry.frame.config(bg="white")
-            self.active_entry = None
-
-    def time_to_seconds(self, time_str):
-        h, m, s = map(int, time_str.split(":"))
-        return h * 3600 + m * 60 + s
-
 class StopwatchEntry:
-    def __init__(self, parent, app, entry_id):
+    # One row of the entry list, recycled by EntryListView to show whichever entry is visible
+    def __init__(self, parent, app):
         self.parent = parent
         self.app = app
-        self.id = entry_id  # Unique ID for the entry
-        self.running = False
-        self.start_time = None
-        self.elapsed_time = 0
-        self.entry_date = datetime.today().strftime('%Y-%m-%d')
+        self.entry = None  # Model state currently shown by these widgets
         self.selected = tk.BooleanVar()
+        self.selected.trace('w', self.on_selected_change)
 
         self.frame = tk.Frame(self.parent, bg="white")
-        self.frame.pack(pady=5, fill='x')
 
         self.checkbox = tk.Checkbutton(self.frame, variable=self.selected)
         self.checkbox.pack(side=tk.LEFT, padx=5)
 
         self.name_var = tk.StringVar()
+        self.name_var.trace('w', self.on_name_change)
         self.name_entry = tk.Entry(self.frame, textvariable=self.name_var, width=20)
         self.name_entry.pack(side=tk.LEFT, padx=5)
 
@@ -409,67 +453,78 @@ class StopwatchEntry:
         self.custom_time_entry = tk.Entry(self.frame, width=10)
         self.custom_time_entry.pack(side=tk.LEFT, padx=5)
 
-        self.app.update_window_size()
-
-    def set_values(self, name, elapsed_time, entry_date):
-        self.name_var.set(name)
-        self.elapsed_time = self.time_to_seconds(elapsed_time)
-        self.label.config(text=elapsed_time)
-        self.entry_date = entry_date
+    @property
+    def id(self):
+        return self.entry.id if self.entry else None
+
+    def bind(self, entry):
+        self.entry = None  # Don't write the previous entry's values into the new one
+        self.name_var.set(entry.name)
+        self.selected.set(entry.selected)
+        self.custom_time_entry.delete(0, tk.END)
+        self.entry = entry
+        self.refresh()
+
+    def unbind(self):
+        self.entry = None
+
+    def on_name_change(self, *args):
+        if self.entry:
+            self.entry.name = self.name_var.get()
+            self.app.track_name_length(self.entry)
+            self.app.state_changed()
+            self.app.update_name_width()
+
+    def on_selected_change(self, *args):
+        if self.entry:
+            self.entry.selected = self.selected.get()
+
+    def refresh(self):
+        if self.name_var.get() != self.entry.name:
+            self.name_var.set(self.entry.name)
+        if self.selected.get() != self.entry.selected:
+            self.selected.set(self.entry.selected)
+        self.update_time()
+        self.frame.config(bg="lightgreen" if self.entry.running else "white")
+
+    def update_time(self):
+        text = format_duration(self.entry.current_elapsed())
+        if text != self.label.cget("text"):
+            self.label.config(text=text)
 
     def start(self):
-        if not self.running:
-            self.app.set_active_entry(self)
-            self.running = True
-            self.start_time = time.time() - self.elapsed_time
-            self.update()
-            self.app.log_to_csv("Start", self)
+        if not self.entry.running:
+            self.app.session.start(self.entry)
 
     def stop(self):
-        if self.running:
-            self.running = False
-            self.elapsed_time = time.time() - self.start_time
-            self.app.set_inactive_entry(self)
-            self.app.log_to_csv("Stop", self)
-
+        self.app.session.stop(self.entry)
 
     def reset(self):
-        self.running = False
-        self.start_time = None
-        self.elapsed_time = 0
-        self.label.config(text="00:00:00")
+        self.app.session.reset(self.entry)
 
     def remove(self):
-        self.app.remove_entry(self)
+        self.app.remove_entry(self.id)
 
-    # Update the rename method in the StopwatchEntry class
     def rename(self):
-        entry_id = self.id
-        base_name = self.app.rename_map.get(entry_id, self.name_var.get())
-        new_name = self.name_entry.get()
-        self.app.log_to_csv("Rename", self, comment=f"Renamed from {base_name}")
-        self.name_var.set(new_name)
-
-    def update(self):
-        if self.running:
-            self.elapsed_time = time.time() - self.start_time
-            formatted_time = time.strftime("%H:%M:%S", time.gmtime(self.elapsed_time))
-            self.label.config(text=formatted_time)
-            self.app.refresh_ui()
-            self.parent.after(1000, self.update)
+        self.app.session.rename(self.entry, self.name_entry.get())
 
     def add_custom_time(self):
         time_str = self.custom_time_entry.get()
         if time_str:
-            self.elapsed_time += self.time_to_seconds(time_str)
-            self.label.config(text=time.strftime("%H:%M:%S", time.gmtime(self.elapsed_time)))
-            self.app.log_to_csv("Add Time", self)
-
-    def time_to_seconds(self, time_str):
-        h, m, s = map(int, time_str.split(":"))
-        return h * 3600 + m * 60 + s
+            self.app.session.add_time(self.entry, parse_duration(time_str))
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time tracking stopwatch.")
+    parser.add_argument("--profile", metavar="MODES",
+                        help="instrument the app: spans, trace[:PATH], cprofile[:PATH], comma separated")
+    parser.add_argument("--serve", metavar="PORT", type=int, default=port_from_env(),
+                        help="serve the entries as HTTP/JSON on 127.0.0.1:PORT")
+    args = parser.parse_args()
+    if args.profile:
+        instrumentation.enable(args.profile)
     root = tk.Tk()
     app = StopwatchApp(root)
+    if args.serve:
+        app.start_server(args.serve)
     root.mainloop()
+    app.storage.close()
@@ -0,0 +1,93 @@
+import time
+from datetime import date
+from functools import lru_cache
+
+# Durations and timestamps as the logs write them, parsed and formatted without strftime/strptime:
+#   duration   "HH:MM:SS", hours keep counting past 24 and a leading "-" makes it negative
+#   timestamp  "YYYY-MM-DD HH:MM:SS", the local wall-clock time of the row
+#   date       "YYYY-MM-DD"
+# The "MM:SS" and "HH" parts are precomputed in both directions, so that formatting is two lookups
+# and a concatenation and parsing two dict lookups; days are memoized, and the local timestamp is
+# formatted once per second however many rows are logged in it.
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+DATE_CACHE_SIZE = 4096
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+_HOURS = [f"{h:02}" for h in range(100)]
+_MINUTES_SECONDS = [f"{m:02}:{s:02}" for m in range(60) for s in range(60)]
+_HOUR_SECONDS = {text: h * 3600 for h, text in enumerate(_HOURS)}
+_MINUTE_SECONDS = {text: seconds for seconds, text in enumerate(_MINUTES_SECONDS)}
+_TABLE_LIMIT = len(_HOURS) * 3600
+
+
+def format_duration(seconds):
+    # Whole seconds, truncated toward zero
+    seconds = int(seconds)
+    if 0 <= seconds < _TABLE_LIMIT:
+        return _HOURS[seconds // 3600] + ":" + _MINUTES_SECONDS[seconds % 3600]
+    if seconds < 0:
+        return "-" + format_duration(-seconds)
+    return f"{seconds // 3600}:{_MINUTES_SECONDS[seconds % 3600]}"
+
+
+def parse_duration(text):
+    try:
+        return _HOUR_SECONDS[text[0:2]] + _MINUTE_SECONDS[text[3:8]] if len(text) == 8 and text[2] == ":" \
+            else _parse_duration(text)
+    except KeyError:
+        return _parse_duration(text)  # Digits out of the table's range, e.g. "00:75:00"
+
+
+def _parse_duration(text):
+    sign = 1
+    if text.startswith("-"):
+        sign, text = -1, text[1:]
+    h, m, s = text.split(":")
+    return sign * (int(h) * 3600 + int(m) * 60 + int(s))
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def parse_date(text):
+    # Days since 1970-01-01
+    return date(int(text[0:4]), int(text[5:7]), int(text[8:10])).toordinal() - EPOCH_ORDINAL
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def format_date(days):
+    return date.fromordinal(days + EPOCH_ORDINAL).isoformat()
+
+
+def parse_timestamp(text):
+    # Seconds since 1970-01-01 of the wall-clock time as written, with no time zone applied
+    if len(text) != 19:
+        raise ValueError(f"Invalid timestamp {text!r}")
+    return parse_date(text[0:10]) * 86400 + parse_duration(text[11:19])
+
+
+def format_timestamp(seconds):
+    days, remainder = divmod(int(seconds), 86400)
+    return f"{format_date(days)} {format_duration(remainder)}"
+
+
+def parse_local_timestamp(text):
+    # Epoch seconds of a timestamp in local time
+    return time.mktime((int(text[0:4]), int(text[5:7]), int(text[8:10]), int(text[11:13]), int(text[14:16]),
+                        int(text[17:19]), 0, 0, -1))
+
+
+_last_local = (None, "")  # (second, timestamp) of the last local_timestamp() call
+
+
+def local_timestamp(now=None):
+    # Local "YYYY-MM-DD HH:MM:SS" of now
+    global _last_local
+    second = int(now if now is not None else time.time())
+    cached_second, text = _last_local
+    if second != cached_second:
+        text = time.strftime(TIMESTAMP_FORMAT, time.localtime(second))
+        _last_local = (second, text)
+    return text
+
+
+def local_date(now=None):
+    return local_timestamp(now)[:10]